@@ -1,6 +1,12 @@
-from fastapi import FastAPI
-from app.routes import router as api_router
+# Die FastAPI-Anwendung wird erst beim Zugriff auf app.app erzeugt, damit z. B. "import app.scraper"
+# weder FastAPI noch die Routen lädt
+def __getattr__(name):
+    if name == "app":
+        from fastapi import FastAPI
+        from app.routes import router as api_router
 
-app = FastAPI()
-
-app.include_router(api_router)
\ No newline at end of file
+        app = FastAPI()
+        app.include_router(api_router)
+        globals()["app"] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
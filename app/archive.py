@@ -0,0 +1,116 @@
+from datetime import datetime
+import hashlib
+import json
+import mmap
+import os
+import threading
+import zlib
+
+# Inhaltsadressiertes Archiv abgerufener Seiten:
+#   pages.pack   - zlib-komprimierte Seiteninhalte, jeder Inhalt (SHA-256) nur einmal
+#   index.jsonl  - ein Eintrag pro Abruf: URL, Zeitpunkt, Hash, Position im Pack, Kodierung, Validatoren
+PACK_FILE = "pages.pack"
+INDEX_FILE = "index.jsonl"
+
+
+class ArchiveError(Exception):
+    # Indexeintrag ohne passenden Inhalt im Pack (leeres oder abgeschnittenes pages.pack)
+    pass
+
+
+class PageArchive:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._pack_path = os.path.join(path, PACK_FILE)
+        self._index_path = os.path.join(path, INDEX_FILE)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._blobs = {}
+        self._map = None
+        self._map_size = 0
+
+        if os.path.exists(self._index_path):
+            with open(self._index_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._add_entry(json.loads(line))
+
+        self._pack = open(self._pack_path, "ab")
+        self._index = open(self._index_path, "a", encoding="utf-8")
+
+    def _add_entry(self, entry):
+        self._entries.setdefault(entry["url"], []).append(entry)
+        self._blobs[entry["sha256"]] = (entry["offset"], entry["length"])
+
+    def store(self, url, content, encoding=None, etag=None, last_modified=None, fetched_at=None):
+        sha256 = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            if sha256 in self._blobs:
+                offset, length = self._blobs[sha256]
+            else:
+                blob = zlib.compress(content)
+                offset, length = self._pack.tell(), len(blob)
+                self._pack.write(blob)
+                self._pack.flush()
+            entry = {
+                "url": url,
+                "fetched_at": (fetched_at or datetime.utcnow()).isoformat(),
+                "sha256": sha256,
+                "offset": offset,
+                "length": length,
+                "encoding": encoding,
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+            self._index.write(json.dumps(entry) + "\n")
+            self._index.flush()
+            self._add_entry(entry)
+        return entry
+
+    def urls(self):
+        return list(self._entries)
+
+    def latest(self, url, before=None):
+        # Jüngster Abruf einer URL, optional nur bis zu einem Zeitpunkt (datetime)
+        entries = self._entries.get(url, [])
+        if before is not None:
+            entries = [entry for entry in entries if entry["fetched_at"] <= before.isoformat()]
+        return max(entries, key=lambda entry: entry["fetched_at"]) if entries else None
+
+    def read(self, entry):
+        end = entry["offset"] + entry["length"]
+        with self._lock:
+            if self._map is None or end > self._map_size:
+                # Das Pack ist seit dem letzten Mapping gewachsen
+                self._remap()
+            if self._map is None or end > self._map_size:
+                raise ArchiveError(
+                    f"Archive entry for {entry['url']} ({entry['fetched_at']}, bytes {entry['offset']}-{end}) "
+                    f"is outside {self._pack_path} ({self._map_size} bytes)"
+                )
+            blob = self._map[entry["offset"]:end]
+        try:
+            return zlib.decompress(blob)
+        except zlib.error as e:
+            raise ArchiveError(f"Archive entry for {entry['url']} ({entry['fetched_at']}) is corrupt: {e}") from e
+
+    def _remap(self):
+        if self._map is not None:
+            self._map.close()
+        with open(self._pack_path, "rb") as f:
+            self._map_size = os.fstat(f.fileno()).st_size
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self._map_size else None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._pack.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
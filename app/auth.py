@@ -1,13 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models import User
-from app.db import get_session
+from app.cache import TTLCache
+from app.db import get_async_db
+from config import config
+import asyncio
 import os
+import time
 
 # Geheimlüssel zum Signieren der JWTs
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -17,17 +24,43 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+settings = config[os.getenv("ENV", "development")]
+
+# Benutzer nach "sub" des Tokens als (Benutzer, Zeitpunkt der letzten Prüfung von is_active); die Signatur
+# und das Ablaufdatum werden weiterhin bei jeder Anfrage geprüft
+user_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL)
+
+# Eigener Pool für bcrypt: begrenzt parallele Hash-Berechnungen und hält den allgemeinen Threadpool frei
+password_pool = ThreadPoolExecutor(max_workers=settings.AUTH_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+@event.listens_for(User.is_active, "set")
+def invalidate_cached_user(target, value, oldvalue, initiator):
+    # Änderung über das ORM in diesem Prozess: Eintrag sofort verwerfen. Änderungen aus anderen Prozessen
+    # oder per SQL erkennt get_current_user() nach spätestens AUTH_ACTIVE_CHECK_INTERVAL Sekunden.
+    if value != oldvalue:
+        user_cache.pop(target.username)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(User).filter(User.username == username).first()
+async def is_still_active(db: AsyncSession, user: User):
+    # Eine Abfrage über den Primärschlüssel; None, wenn der Benutzer gelöscht wurde
+    return (await db.exec(select(User.is_active).where(User.id == user.id))).first()
+
+async def get_user(db: AsyncSession, username: str):
+    result = await db.exec(select(User).where(User.username == username))
+    return result.first()
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user(db, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # bcrypt ist absichtlich langsam und darf die Event-Loop nicht blockieren
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(password_pool, verify_password, password, user.hashed_password):
         return False
     return user
 
@@ -41,7 +74,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_session)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -54,9 +87,20 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+    cached = user_cache.get(username)
+    if cached is not None:
+        user, checked_at = cached
+        if time.monotonic() - checked_at < settings.AUTH_ACTIVE_CHECK_INTERVAL:
+            return user
+        if await is_still_active(db, user) == user.is_active:
+            user_cache.set(username, (user, time.monotonic()))
+            return user
+        # Deaktiviert, reaktiviert oder gelöscht: vollständig neu laden
+    user = await get_user(db, username)
     if user is None:
+        user_cache.pop(username)
         raise credentials_exception
+    user_cache.set(username, (user, time.monotonic()))
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
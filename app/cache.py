@@ -0,0 +1,72 @@
+from collections import OrderedDict
+import threading
+import time
+from app.catalogue import get_catalogue_version
+from app.db import get_async_session
+
+
+class TTLCache:
+    # Threadsicherer LRU-Cache mit maximaler Lebensdauer pro Eintrag
+    def __init__(self, maxsize: int = 256, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CatalogueVersionTracker:
+    # Fragt die Katalogversion höchstens alle check_interval Sekunden in der Datenbank ab
+    def __init__(self, check_interval: float = 5):
+        self.check_interval = check_interval
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def on_change(self, callback):
+        self._listeners.append(callback)
+
+    async def current(self) -> int:
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.check_interval:
+            return self._version
+        async with get_async_session() as session:
+            version = await session.run_sync(get_catalogue_version)
+        with self._lock:
+            changed = self._version is not None and version != self._version
+            self._version = version
+            self._checked_at = now
+        if changed:
+            for callback in self._listeners:
+                callback(version)
+        return version
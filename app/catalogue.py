@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+from sqlmodel import select
+from app.models import CatalogueVersion
+
+CATALOGUE_VERSION_ID = 1
+
+
+def get_catalogue_version(session) -> int:
+    version = session.exec(
+        select(CatalogueVersion.version).where(CatalogueVersion.id == CATALOGUE_VERSION_ID)
+    ).first()
+    return version or 0
+
+
+def bump_catalogue_version(session) -> int:
+    # Wird im selben Commit wie die geänderten Dienstleistungen geschrieben
+    state = session.get(CatalogueVersion, CATALOGUE_VERSION_ID, with_for_update=True)
+    if state is None:
+        state = CatalogueVersion(id=CATALOGUE_VERSION_ID, version=0)
+    state.version += 1
+    state.updated_at = datetime.now(timezone.utc)
+    session.add(state)
+    return state.version
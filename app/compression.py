@@ -0,0 +1,119 @@
+from fastapi.encoders import jsonable_encoder
+from datetime import datetime
+from pydantic import BaseModel
+from typing import Optional
+import gzip
+import hashlib
+import json
+
+try:
+    import orjson
+except ImportError:  # optional; ohne orjson über jsonable_encoder und json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; ohne brotli wird nur gzip angeboten
+    brotli = None
+
+# Kompressionsstufen: pro Anfrage schnell, für vorberechnete Antworten (einmal pro Katalogversion) stärker
+GZIP_LEVEL = 6
+STATIC_GZIP_LEVEL = 9
+BROTLI_QUALITY = 4
+STATIC_BROTLI_QUALITY = 9
+
+
+def format_datetime(value: datetime) -> str:
+    # Wie Pydantic (und damit der Snapshot): UTC als "Z"
+    text = value.isoformat()
+    return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+
+def _default(obj):
+    # SQLModel-Objekte (z. B. Service ohne Feldauswahl)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, datetime):
+        return format_datetime(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(
+        jsonable_encoder(content, custom_encoder={datetime: format_datetime}), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def available_encodings():
+    # In der Reihenfolge der Präferenz bei gleichem q-Wert
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    # Accept-Encoding auswerten; None = unkomprimiert ausliefern
+    preferences = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        preferences[name] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = preferences.get(encoding, preferences.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str, static: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=STATIC_GZIP_LEVEL if static else GZIP_LEVEL, mtime=0)
+
+
+class EncodedBody:
+    # Fertig serialisierte Antwort mit ihren komprimierten Varianten. static=True komprimiert sofort in
+    # allen Kodierungen (im Threadpool aufrufen), sonst entsteht jede Variante bei der ersten Anfrage.
+    def __init__(self, body: bytes, headers: dict, min_size: int, static: bool = False):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.headers = {**headers, "ETag": f'"{self.etag}"'}
+        self.compressible = len(body) >= min_size
+        self.static = static
+        self.variants = {}
+        if static and self.compressible:
+            for encoding in available_encodings():
+                self.variant(encoding)
+        if self.compressible:
+            self.headers["Vary"] = "Accept-Encoding"
+
+    @property
+    def etags(self):
+        # Alle Varianten haben denselben Inhalt: If-None-Match mit einer davon genügt
+        return [f'"{self.etag}"'] + [f'"{self.etag}-{encoding}"' for encoding in available_encodings()]
+
+    def variant(self, encoding: str) -> bytes:
+        body = self.variants.get(encoding)
+        if body is None:
+            body = self.variants[encoding] = compress(self.body, encoding, self.static)
+        return body
+
+    def choose(self, accept_encoding: Optional[str]) -> Optional[str]:
+        return negotiate_encoding(accept_encoding) if self.compressible else None
+
+    def headers_for(self, encoding: Optional[str]) -> dict:
+        if encoding is None:
+            return self.headers
+        return {**self.headers, "ETag": f'"{self.etag}-{encoding}"', "Content-Encoding": encoding}
@@ -1,62 +1,114 @@
-from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy import create_engine as sqlalchemy_create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from config import config
+import logging
 import os
+import threading
 from contextlib import contextmanager
+from app.metrics import instrument_engine, instrumented_pool
+from app.migrations import run_migrations
+
+logger = logging.getLogger(__name__)
 
 # Bestimmen Sie die Umgebung (Standard ist Entwicklung)
 env = os.getenv("ENV", "development")
-DATABASE_URL = config[env].SQLALCHEMY_DATABASE_URI
+settings = config[env]
+DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI
+
+# Asynchrone Treiber zu den synchronen Dialekten
+ASYNC_DRIVERS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+def to_async_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
 
-# Manuelles Parsen der Datenbank-URL, um Verbindungsparameter zu extrahieren
-url_parts = DATABASE_URL.split('/')
-database_name = url_parts[-1]
-base_url = '/'.join(url_parts[:-1])
+POOL_OPTIONS = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+}
 
-# Manuell die Verbindungs-URL ohne den Datenbankteil konstruieren
-temp_url = f"{base_url}/"
+# Engines werden erst bei der ersten Verwendung erzeugt: der Import verbindet sich nicht mit der Datenbank
+_engine = None
+_async_engine = None
+_async_session_factory = None
+_lock = threading.Lock()
 
-# Erstellen Sie eine temporäre Engine, um eine Verbindung zum MySQL-Server herzustellen
-temp_engine = sqlalchemy_create_engine(temp_url)
+def get_engine():
+    # Synchrone Engine für Scraper, Migrationen und Hilfsfunktionen
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = create_engine(DATABASE_URL, poolclass=instrumented_pool(QueuePool, "sync"), **POOL_OPTIONS)
+                instrument_engine(_engine, "sync")
+    return _engine
 
-try:
-    # Erstellen Sie die Datenbank, falls sie nicht existiert
-    with temp_engine.connect() as conn:
-        conn.execute(text(f"CREATE DATABASE IF NOT EXISTS {database_name}"))
-        conn.execute(text(f"USE {database_name}"))
-except OperationalError as e:
-    print(f"Fehler beim Verbinden mit der Datenbank: {e}")
-    raise
+def get_async_engine():
+    # Asynchrone Engine für die API-Routen, damit keine Abfrage die Event-Loop blockiert
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        with _lock:
+            if _async_engine is None:
+                _async_engine = create_async_engine(
+                    settings.ASYNC_DATABASE_URL or to_async_url(DATABASE_URL),
+                    poolclass=instrumented_pool(AsyncAdaptedQueuePool, "async"), **POOL_OPTIONS
+                )
+                instrument_engine(_async_engine.sync_engine, "async")
+                _async_session_factory = async_sessionmaker(_async_engine, class_=AsyncSession, expire_on_commit=False)
+    return _async_engine
 
-# Erstellen Sie die eigentliche Engine für die Anwendung
-engine = create_engine(DATABASE_URL)
+async def dispose_engines():
+    global _engine, _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+    _engine = _async_engine = _async_session_factory = None
+
+def create_database():
+    # Datenbank auf dem MySQL-Server anlegen, falls sie noch nicht existiert
+    url = make_url(DATABASE_URL)
+    if url.get_backend_name() != "mysql":
+        return
+    temp_engine = sqlalchemy_create_engine(url.set(database=None))
+    try:
+        with temp_engine.connect() as conn:
+            conn.execute(text(f"CREATE DATABASE IF NOT EXISTS {url.database}"))
+    except OperationalError as e:
+        logger.error(f"Fehler beim Verbinden mit der Datenbank: {e}")
+        raise
+    finally:
+        temp_engine.dispose()
 
 def init_db():
-    SQLModel.metadata.create_all(engine)
-    with engine.connect() as conn:
-        conn.execute(text("ALTER TABLE service MODIFY COLUMN voraussetzungen TEXT"))
-        conn.execute(text("ALTER TABLE service MODIFY COLUMN erforderliche_unterlagen TEXT"))
-        conn.execute(text("ALTER TABLE service MODIFY COLUMN gebuehren TEXT"))
-        conn.execute(text("ALTER TABLE service MODIFY COLUMN rechtsgrundlagen TEXT"))
-        
-        # Prüfen und hinzufügen der Spalte digital_service
-        result = conn.execute(text("SHOW COLUMNS FROM service LIKE 'digital_service'"))
-        if not result.fetchone():
-            conn.execute(text("ALTER TABLE service ADD COLUMN digital_service BOOLEAN DEFAULT FALSE"))
-        
-        # Prüfen und hinzufügen der Spalte zustaendiges_amt
-        result = conn.execute(text("SHOW COLUMNS FROM service LIKE 'zustaendiges_amt'"))
-        if not result.fetchone():
-            conn.execute(text("ALTER TABLE service ADD COLUMN zustaendiges_amt TEXT"))
-        
-        conn.execute(text("ALTER TABLE form MODIFY COLUMN url VARCHAR(2048)"))
-        conn.execute(text("ALTER TABLE form MODIFY COLUMN title VARCHAR(2048)"))
+    create_database()
+    run_migrations(get_engine())
 
 @contextmanager
 def get_session():
-    session = Session(engine)
+    session = Session(get_engine())
     try:
         yield session
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+def get_async_session():
+    # Verwendung: async with get_async_session() as session
+    get_async_engine()
+    return _async_session_factory()
+
+# FastAPI-Abhängigkeit: Depends() erwartet eine Generatorfunktion, keinen Kontextmanager
+def get_db():
+    with get_session() as session:
+        yield session
+
+async def get_async_db():
+    async with get_async_session() as session:
+        yield session
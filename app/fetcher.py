@@ -0,0 +1,88 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.metrics import scraper_fetch_bytes, scraper_fetch_duration
+
+# HTTP-Statuscodes, bei denen ein erneuter Versuch sinnvoll ist
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class HostRateLimiter:
+    # Verteilt Anfragen pro Host auf feste Zeitfenster (rate = Anfragen pro Sekunde)
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def create_http_session(pool_size: int = 10, max_retries: int = 3, backoff_factor: float = 0.5) -> requests.Session:
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    # Ein gemeinsamer Verbindungspool hält Keep-Alive-Verbindungen für alle Worker offen
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class Fetcher:
+    def __init__(self, concurrency: int = 1, rate_limit: float = 0, max_retries: int = 3,
+                 backoff_factor: float = 0.5, timeout: float = 10):
+        self.session = create_http_session(max(concurrency, 1), max_retries, backoff_factor)
+        self.rate_limiter = HostRateLimiter(rate_limit)
+        self.timeout = timeout
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        self.rate_limiter.wait(url)
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, timeout=self.timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            scraper_fetch_duration.observe(time.perf_counter() - start, status="error")
+            raise
+        scraper_fetch_duration.observe(time.perf_counter() - start, status=str(response.status_code))
+        scraper_fetch_bytes.inc(len(response.content))
+        response.raise_for_status()
+        return response
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        # Nur Status und Header (Formular-Links). Server ohne HEAD-Unterstützung werden per GET gefragt,
+        # dessen Inhalt ungelesen bleibt. Fehlerstatus werden zurückgegeben, nicht ausgelöst.
+        self.rate_limiter.wait(url)
+        start = time.perf_counter()
+        try:
+            response = self.session.head(url, timeout=self.timeout, allow_redirects=True, **kwargs)
+            if response.status_code in (405, 501):
+                response = self.session.get(url, timeout=self.timeout, stream=True, **kwargs)
+                response.close()
+        except requests.exceptions.RequestException:
+            scraper_fetch_duration.observe(time.perf_counter() - start, status="error")
+            raise
+        scraper_fetch_duration.observe(time.perf_counter() - start, status=str(response.status_code))
+        return response
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+from sqlalchemy import bindparam, delete, func, insert, update
+from sqlmodel import select
+from app.models import CrawlJob
+import logging
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class CrawlJobTracker:
+    # Hält den Zustand jeder URL in der Tabelle crawljob. Ergebnisse werden gepuffert und im selben
+    # Commit wie der zugehörige Stapel des ServiceWriter geschrieben: eine URL gilt erst als erledigt,
+    # wenn ihre Dienstleistung tatsächlich in der Datenbank steht.
+    def __init__(self, session, max_attempts=3):
+        self.session = session
+        self.max_attempts = max_attempts
+        self.pending = []
+
+    def resumable_urls(self):
+        # Nur wenn der letzte Crawl abgebrochen wurde (es gibt noch offene URLs):
+        # offene und fehlgeschlagene URLs, solange sie nicht zu oft gescheitert sind
+        table = CrawlJob.__table__
+        if self.session.exec(select(CrawlJob.id).where(CrawlJob.status == PENDING).limit(1)).first() is None:
+            return []
+        rows = self.session.execute(
+            select(table.c.url).where(
+                (table.c.status == PENDING) | ((table.c.status == FAILED) & (table.c.attempts < self.max_attempts))
+            ).order_by(table.c.id)
+        ).all()
+        return [url for (url,) in rows]
+
+    def failed_urls(self):
+        return list(self.session.exec(select(CrawlJob.url).where(CrawlJob.status == FAILED).order_by(CrawlJob.id)))
+
+    def start(self, urls, full=True):
+        # Neuer Crawl: alle (bzw. die ausgewählten) URLs auf pending zurücksetzen
+        table = CrawlJob.__table__
+        urls = list(dict.fromkeys(urls))
+        if full:
+            self.session.execute(delete(table))
+        elif urls:
+            self.session.execute(delete(table).where(table.c.url.in_(urls)))
+        if urls:
+            self.session.execute(insert(table), [{"url": url, "status": PENDING, "attempts": 0} for url in urls])
+        self.session.commit()
+        return urls
+
+    def record(self, url, status, error=None, started_at=None):
+        self.pending.append({
+            "b_url": url,
+            "status": status,
+            "last_error": error,
+            "started_at": started_at,
+            "finished_at": datetime.now(timezone.utc),
+        })
+
+    def write(self):
+        # Gepufferte Ergebnisse ausführen, ohne zu committen (Aufruf aus ServiceWriter.flush)
+        if not self.pending:
+            return
+        table = CrawlJob.__table__
+        self.session.execute(
+            update(table).where(table.c.url == bindparam("b_url")).values(attempts=table.c.attempts + 1),
+            self.pending,
+        )
+        self.pending = []
+
+    def commit(self):
+        if self.pending:
+            self.write()
+            self.session.commit()
+
+    def counts(self):
+        table = CrawlJob.__table__
+        return dict(self.session.execute(select(table.c.status, func.count()).group_by(table.c.status)).all())
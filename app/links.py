@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import bindparam, or_, update
+from sqlmodel import select
+from app.catalogue import bump_catalogue_version
+from app.fetcher import Fetcher
+from app.metrics import scraper_link_checks
+from app.models import Form
+from app.pipeline import iter_bounded
+from config import config
+import logging
+import os
+import requests
+
+logger = logging.getLogger(__name__)
+
+settings = config[os.getenv("ENV", "development")]
+
+# Prüfung der Formular-Links: ein HEAD pro eindeutiger URL (auch wenn mehrere Dienstleistungen auf dasselbe
+# Dokument verweisen), parallel über den Verbindungspool des Fetchers und mit Rate-Limit pro Host.
+# Geprüft werden nur Links ohne Ergebnis oder mit einer Prüfung älter als LINK_CHECK_MAX_AGE.
+
+LINK_COLUMNS = ("link_status", "link_content_type", "link_size", "link_error")
+
+
+def create_link_fetcher(concurrency=None):
+    concurrency = concurrency or settings.LINK_CHECK_CONCURRENCY
+    return Fetcher(
+        concurrency=concurrency,
+        rate_limit=settings.LINK_CHECK_RATE_LIMIT,
+        max_retries=settings.SCRAPER_MAX_RETRIES,
+        backoff_factor=settings.SCRAPER_BACKOFF_FACTOR,
+        timeout=settings.SCRAPER_TIMEOUT,
+    )
+
+
+def check_link(fetcher, url):
+    try:
+        response = fetcher.head(url)
+    except requests.exceptions.RequestException as e:
+        return {"link_status": None, "link_content_type": None, "link_size": None, "link_error": str(e)[:255]}
+    size = response.headers.get("Content-Length", "")
+    return {
+        "link_status": response.status_code,
+        "link_content_type": response.headers.get("Content-Type", "")[:255] or None,
+        "link_size": int(size) if size.isdigit() else None,
+        "link_error": None,
+    }
+
+
+def stale_links(session, max_age):
+    # {url: [(form_id, bisheriges Ergebnis), ...]}; nach URL gruppiert, damit jede URL nur einmal geprüft wird
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age)
+    links = {}
+    for form_id, url, *previous in session.exec(
+        select(Form.id, Form.url, *(getattr(Form, column) for column in LINK_COLUMNS))
+        .where(or_(Form.link_checked_at.is_(None), Form.link_checked_at < cutoff))
+        .order_by(Form.id)
+    ):
+        links.setdefault(url, []).append((form_id, tuple(previous)))
+    return links
+
+
+def write_link_results(session, rows, changed):
+    # Geänderte Ergebnisse erhalten eine neue Katalogversion (API-Caches, /changes);
+    # reine Bestätigungen aktualisieren nur link_checked_at
+    table = Form.__table__
+    statement = update(table).where(table.c.id == bindparam("b_id"))
+    if changed:
+        version = bump_catalogue_version(session)
+        now = datetime.now(timezone.utc)
+        for row in changed:
+            row.update(updated_at=now, crawl_version=version)
+        session.execute(statement, changed)
+    if rows:
+        session.execute(statement, rows)
+    session.commit()
+
+
+def check_form_links(session, fetcher, max_age=None, concurrency=None, batch_size=None):
+    # Liefert die Anzahl der Formulare, deren Ergebnis sich geändert hat
+    max_age = settings.LINK_CHECK_MAX_AGE if max_age is None else max_age
+    concurrency = concurrency or settings.LINK_CHECK_CONCURRENCY
+    batch_size = batch_size or settings.SCRAPER_BATCH_SIZE
+
+    links = stale_links(session, max_age)
+    form_count = sum(len(forms) for forms in links.values())
+    logger.info(f"Checking {len(links)} form links ({form_count} forms).")
+
+    rows, changed, changed_count, checked = [], [], 0, 0
+    results = iter_bounded(links, lambda url: check_link(fetcher, url), concurrency, settings.SCRAPER_QUEUE_SIZE)
+    for url, result in results:
+        if result["link_error"]:
+            scraper_link_checks.inc(outcome="error")
+            logger.warning(f"Form link {url} failed: {result['link_error']}")
+        elif result["link_status"] >= 400:
+            scraper_link_checks.inc(outcome="broken")
+            logger.warning(f"Form link {url} returned {result['link_status']}")
+        else:
+            scraper_link_checks.inc(outcome="ok")
+
+        checked_at = datetime.now(timezone.utc)
+        current = tuple(result[column] for column in LINK_COLUMNS)
+        for form_id, previous in links[url]:
+            row = {"b_id": form_id, **result, "link_checked_at": checked_at}
+            (changed if previous != current else rows).append(row)
+
+        checked += 1
+        if checked % batch_size == 0:
+            changed_count += len(changed)
+            write_link_results(session, rows, changed)
+            rows, changed = [], []
+
+    changed_count += len(changed)
+    write_link_results(session, rows, changed)
+    logger.info(f"Checked {checked} form links, {changed_count} forms with changed results.")
+    return changed_count
@@ -0,0 +1,239 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Kleine Metrik-Bibliothek im Prometheus-Textformat (ohne zusätzliche Abhängigkeit).
+# API und Scraper registrieren ihre Metriken in REGISTRY; /metrics bzw. die Textdatei des Scrapers
+# geben render() aus.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+REGISTRY = []
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # Labels -> [Anzahl je Bucket..., Summe, Anzahl]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        state = self._values.get(tuple(labels[name] for name in self.labelnames))
+        return state[-1] if state else 0
+
+    def sum(self, **labels):
+        state = self._values.get(tuple(labels[name] for name in self.labelnames))
+        return state[-2] if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + (("le", _format_value(bound)),), cumulative
+            yield f"{self.name}_bucket", labels + (("le", "+Inf"),), state[-1]
+            yield f"{self.name}_sum", labels, state[-2]
+            yield f"{self.name}_count", labels, state[-1]
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path):
+    # Für den Textfile-Collector des node_exporter; atomar, damit nie eine halbe Datei gelesen wird
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+
+# API
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ["method", "route", "status"]
+)
+
+# Datenbank (API und Scraper)
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ["engine"], QUERY_BUCKETS
+)
+db_pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ["engine"], QUERY_BUCKETS
+)
+
+# Scraper
+scraper_fetch_duration = Histogram("scraper_fetch_duration_seconds", "HTTP fetch latency", ["status"])
+scraper_fetch_bytes = Counter("scraper_fetch_bytes_total", "Response bytes downloaded")
+scraper_parse_duration = Histogram(
+    "scraper_parse_duration_seconds", "Parse time per service page", buckets=QUERY_BUCKETS + (2.5, 5.0)
+)
+scraper_commit_duration = Histogram("scraper_commit_duration_seconds", "Time to write and commit one batch")
+scraper_pages = Counter("scraper_pages_total", "Service pages by outcome", ["outcome"])
+scraper_link_checks = Counter("scraper_link_checks_total", "Checked form links by outcome", ["outcome"])
+
+
+def instrument_engine(engine, name):
+    # Dauer jeder SQL-Anweisung über die Cursor-Events der (synchronen) Engine;
+    # die Anzahl der Abfragen ergibt sich aus db_query_duration_seconds_count
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        db_query_duration.observe(time.perf_counter() - conn.info["query_start"].pop(), engine=name)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+def instrumented_pool(base, name):
+    # Pool-Unterklasse, die die Wartezeit beim Ausleihen einer Verbindung misst
+    # (_do_get() blockiert, solange pool_size + max_overflow Verbindungen vergeben sind)
+    class InstrumentedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                db_pool_checkout_wait.observe(time.perf_counter() - start, engine=name)
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+class MetricsMiddleware:
+    # ASGI-Middleware: Latenz je Route-Template und optionales Profiling einzelner Anfragen.
+    # Mit profile_sample_rate > 0 wird ein Anteil der Anfragen mit cProfile aufgezeichnet (immer nur eine
+    # gleichzeitig); überschreitet eine davon profile_threshold Sekunden, wird das Profil geloggt.
+    # Das Profil enthält alles, was währenddessen in der Event-Loop lief, also auch parallele Anfragen.
+    def __init__(self, app, profile_sample_rate=0.0, profile_threshold=1.0):
+        self.app = app
+        self.profile_sample_rate = profile_sample_rate
+        self.profile_threshold = profile_threshold
+        self._profiling = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profiler = None
+        if self.profile_sample_rate and random.random() < self.profile_sample_rate \
+                and self._profiling.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            http_request_duration.observe(elapsed, method=scope["method"], route=path, status=str(status))
+            if profiler is not None:
+                profiler.disable()
+                self._profiling.release()
+                if elapsed >= self.profile_threshold:
+                    output = io.StringIO()
+                    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(25)
+                    logger.warning(f"Slow request {scope['method']} {scope['path']} took {elapsed:.3f} s\n{output.getvalue()}")
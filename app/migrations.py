@@ -0,0 +1,201 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from sqlalchemy import inspect, text
+from sqlmodel import Session, SQLModel
+from app.catalogue import get_catalogue_version
+from app.models import CrawlJob, SchemaVersion, Tombstone
+from app.persistence import backfill_service_offices
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Versionierte Schema-Migrationen. Jede Migration prüft selbst, ob ihre Änderung schon vorhanden ist,
+# und kann gefahrlos wiederholt werden; ausgeführt werden nur Versionen oberhalb von schemaversion.version.
+# Neue Datenbanken erhalten das aktuelle Schema über create_all() und starten direkt mit der neuesten Version.
+
+SCHEMA_VERSION_ID = 1
+MIGRATION_LOCK = "berlin_services_schema"
+
+
+def has_column(conn, table, column):
+    return column in {col["name"] for col in inspect(conn).get_columns(table)}
+
+
+def has_index(conn, table, columns):
+    # Index oder Unique-Constraint über genau diese Spalten, unabhängig vom Namen
+    inspector = inspect(conn)
+    existing = inspector.get_indexes(table) + inspector.get_unique_constraints(table)
+    return any(item["column_names"] == columns for item in existing)
+
+
+def add_column(conn, table, column, definition):
+    if not has_column(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+
+
+def create_index(conn, name, table, columns, unique=False):
+    if not has_index(conn, table, columns):
+        conn.execute(text(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({', '.join(columns)})"))
+
+
+def widen_text_columns(engine):
+    # Lange Abschnitte und Formular-URLs passen nicht in VARCHAR(255)
+    if engine.dialect.name != "mysql":
+        return
+    with engine.begin() as conn:
+        for column in ["voraussetzungen", "erforderliche_unterlagen", "gebuehren", "rechtsgrundlagen"]:
+            conn.execute(text(f"ALTER TABLE service MODIFY COLUMN {column} TEXT"))
+        conn.execute(text("ALTER TABLE form MODIFY COLUMN url VARCHAR(2048)"))
+        conn.execute(text("ALTER TABLE form MODIFY COLUMN title VARCHAR(2048)"))
+
+
+def add_service_details(engine):
+    with engine.begin() as conn:
+        add_column(conn, "service", "digital_service", "BOOLEAN DEFAULT FALSE")
+        add_column(conn, "service", "zustaendiges_amt", "TEXT")
+
+
+def add_incremental_crawl_columns(engine):
+    with engine.begin() as conn:
+        for column, definition in [
+            ("source_url", "VARCHAR(512)"),
+            ("etag", "VARCHAR(255)"),
+            ("last_modified", "VARCHAR(64)"),
+            ("content_hash", "VARCHAR(64)"),
+        ]:
+            add_column(conn, "service", column, definition)
+        create_index(conn, "ix_service_source_url", "service", ["source_url"], unique=True)
+
+
+def add_digital_service_index(engine):
+    with engine.begin() as conn:
+        create_index(conn, "ix_service_digital_service", "service", ["digital_service"])
+
+
+def add_username_index(engine):
+    # Benutzer werden bei jeder Anmeldung über den Namen gesucht
+    with engine.begin() as conn:
+        create_index(conn, "ix_user_username", "user", ["username"])
+
+
+def backfill_offices(engine):
+    # Behörden-Tabellen für bereits gecrawlte Dienstleistungen füllen
+    with Session(engine) as session:
+        backfill_service_offices(session)
+
+
+def create_crawl_jobs(engine):
+    SQLModel.metadata.create_all(engine, tables=[CrawlJob.__table__])
+
+
+def add_change_tracking(engine):
+    # Bestehende Zeilen zählen als in der aktuellen Katalogversion angelegt; data_hash fehlt noch,
+    # daher meldet der nächste Crawl jede Dienstleistung und jedes Formular einmal als geändert
+    with engine.begin() as conn:
+        for table in ["service", "form"]:
+            for column, definition in [
+                ("data_hash", "VARCHAR(64)"),
+                ("updated_at", "DATETIME"),
+                ("created_version", "INTEGER NOT NULL DEFAULT 0"),
+                ("crawl_version", "INTEGER NOT NULL DEFAULT 0"),
+            ]:
+                add_column(conn, table, column, definition)
+            create_index(conn, f"ix_{table}_crawl_version", table, ["crawl_version"])
+    with Session(engine) as session:
+        version = get_catalogue_version(session)
+        for table in ["service", "form"]:
+            session.execute(
+                text(f"UPDATE {table} SET created_version = :version, crawl_version = :version, updated_at = :now "
+                     "WHERE updated_at IS NULL"),
+                {"version": version, "now": datetime.now(timezone.utc)},
+            )
+        session.commit()
+    SQLModel.metadata.create_all(engine, tables=[Tombstone.__table__])
+
+
+def add_form_link_columns(engine):
+    with engine.begin() as conn:
+        for column, definition in [
+            ("link_status", "INTEGER"),
+            ("link_content_type", "VARCHAR(255)"),
+            ("link_size", "BIGINT"),
+            ("link_error", "VARCHAR(255)"),
+            ("link_checked_at", "DATETIME"),
+        ]:
+            add_column(conn, "form", column, definition)
+        create_index(conn, "ix_form_link_checked_at", "form", ["link_checked_at"])
+
+
+MIGRATIONS = [
+    (1, widen_text_columns),
+    (2, add_service_details),
+    (3, add_incremental_crawl_columns),
+    (4, add_digital_service_index),
+    (5, add_username_index),
+    (6, backfill_offices),
+    (7, create_crawl_jobs),
+    (8, add_change_tracking),
+    (9, add_form_link_columns),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(engine):
+    # None, solange die Tabelle schemaversion noch nicht existiert
+    if not inspect(engine).has_table(SchemaVersion.__tablename__):
+        return None
+    with Session(engine) as session:
+        state = session.get(SchemaVersion, SCHEMA_VERSION_ID)
+        return state.version if state else 0
+
+
+def set_schema_version(engine, version):
+    with Session(engine) as session:
+        state = session.get(SchemaVersion, SCHEMA_VERSION_ID) or SchemaVersion(id=SCHEMA_VERSION_ID)
+        state.version = version
+        state.applied_at = datetime.now(timezone.utc)
+        session.add(state)
+        session.commit()
+
+
+@contextmanager
+def migration_lock(engine):
+    # Starten mehrere Worker gleichzeitig, migriert nur einer; die anderen warten auf die Sperre
+    if engine.dialect.name != "mysql":
+        yield
+        return
+    with engine.connect() as conn:
+        # 1 = Sperre erhalten, 0 = Zeitüberschreitung, NULL = Fehler; ohne Sperre nicht migrieren
+        acquired = conn.execute(text("SELECT GET_LOCK(:name, 300)"), {"name": MIGRATION_LOCK}).scalar()
+        if acquired != 1:
+            raise RuntimeError(f"Could not acquire migration lock {MIGRATION_LOCK} (GET_LOCK returned {acquired})")
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK})
+
+
+def run_migrations(engine):
+    # Aktuelles Schema: eine einzige Abfrage, keine DDL und keine Tabellensperren
+    if get_schema_version(engine) == LATEST_VERSION:
+        return LATEST_VERSION
+
+    with migration_lock(engine):
+        current = get_schema_version(engine)
+        if current == LATEST_VERSION:
+            return current
+
+        fresh = not inspect(engine).has_table("service")
+        SQLModel.metadata.create_all(engine)
+        if fresh:
+            logger.info(f"Created schema version {LATEST_VERSION}.")
+            set_schema_version(engine, LATEST_VERSION)
+            return LATEST_VERSION
+
+        for version, migrate in MIGRATIONS:
+            if version <= (current or 0):
+                continue
+            logger.info(f"Applying schema migration {version}: {migrate.__name__}")
+            migrate(engine)
+            set_schema_version(engine, version)
+    return LATEST_VERSION
@@ -1,6 +1,16 @@
 from sqlmodel import SQLModel, Field, Relationship
 from typing import List, Optional
-from sqlalchemy import Column, Text
+from datetime import datetime, timezone
+from sqlalchemy import BigInteger, Column, String, Text
+
+class ServiceOfficeLink(SQLModel, table=True):
+    service_id: Optional[int] = Field(default=None, foreign_key="service.id", primary_key=True)
+    office_id: Optional[int] = Field(default=None, foreign_key="office.id", primary_key=True, index=True)
+
+class Office(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str = Field(sa_column=Column(String(255), unique=True, index=True, nullable=False))
+    services: List["Service"] = Relationship(back_populates="offices", link_model=ServiceOfficeLink)
 
 class Service(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -9,20 +19,88 @@ class Service(SQLModel, table=True):
     erforderliche_unterlagen: Optional[str] = Field(sa_column=Column(Text))
     gebuehren: Optional[str] = Field(sa_column=Column(Text))
     rechtsgrundlagen: Optional[str] = Field(sa_column=Column(Text))
-    digital_service: bool
+    digital_service: bool = Field(index=True)
     zustaendiges_amt: Optional[str] = Field(sa_column=Column(Text))
+    # Quelle und Cache-Validatoren für den inkrementellen Crawl
+    source_url: Optional[str] = Field(default=None, sa_column=Column(String(512), unique=True))
+    etag: Optional[str] = Field(default=None, sa_column=Column(String(255)))
+    last_modified: Optional[str] = Field(default=None, sa_column=Column(String(64)))
+    content_hash: Optional[str] = Field(default=None, sa_column=Column(String(64)))
+    # Änderungsverfolgung für /changes: Hash der extrahierten Felder und Katalogversion von Anlage und letzter Änderung
+    data_hash: Optional[str] = Field(default=None, sa_column=Column(String(64)))
+    updated_at: Optional[datetime] = Field(default=None)
+    created_version: int = Field(default=0)
+    crawl_version: int = Field(default=0, index=True)
     forms: List["Form"] = Relationship(back_populates="service")
+    offices: List[Office] = Relationship(back_populates="services", link_model=ServiceOfficeLink)
+
+# Öffentliche Felder in API-Antworten und Snapshot; Crawl-Spalten (source_url, etag, Hashes, Versionen) bleiben intern
+SERVICE_FIELDS = [
+    "id",
+    "title",
+    "voraussetzungen",
+    "erforderliche_unterlagen",
+    "gebuehren",
+    "rechtsgrundlagen",
+    "digital_service",
+    "zustaendiges_amt",
+]
 
 class Form(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    title: str
-    url: str
+    title: str = Field(sa_column=Column(String(2048), nullable=False))
+    url: str = Field(sa_column=Column(String(2048), nullable=False))
     service_id: Optional[int] = Field(default=None, foreign_key="service.id")
+    data_hash: Optional[str] = Field(default=None, sa_column=Column(String(64)))
+    updated_at: Optional[datetime] = Field(default=None)
+    created_version: int = Field(default=0)
+    crawl_version: int = Field(default=0, index=True)
+    # Ergebnis der letzten Link-Prüfung (app/links.py); link_status None = Verbindungsfehler (link_error)
+    link_status: Optional[int] = Field(default=None)
+    link_content_type: Optional[str] = Field(default=None, sa_column=Column(String(255)))
+    link_size: Optional[int] = Field(default=None, sa_column=Column(BigInteger))
+    link_error: Optional[str] = Field(default=None, sa_column=Column(String(255)))
+    link_checked_at: Optional[datetime] = Field(default=None, index=True)
     service: Optional[Service] = Relationship(back_populates="forms")
 
+FORM_FIELDS = ["id", "title", "url"]
+# Zusätzlich in /changes: Änderungszeitpunkt, Zuordnung und Ergebnis der Link-Prüfung
+CHANGE_SERVICE_FIELDS = SERVICE_FIELDS + ["updated_at"]
+CHANGE_FORM_FIELDS = FORM_FIELDS + ["service_id", "updated_at", "link_status", "link_content_type", "link_size"]
+
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    username: str
+    username: str = Field(index=True)
     email: str
     hashed_password: str
-    is_active: bool = Field(default=True)
\ No newline at end of file
+    is_active: bool = Field(default=True)
+
+class CatalogueVersion(SQLModel, table=True):
+    # Einzelne Zeile, die bei jedem Commit des Scrapers hochgezählt wird
+    id: Optional[int] = Field(default=None, primary_key=True)
+    version: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class SchemaVersion(SQLModel, table=True):
+    # Stand der Migrationen aus app/migrations.py (einzelne Zeile)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    version: int = Field(default=0)
+    applied_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class CrawlJob(SQLModel, table=True):
+    # Zustand jeder Dienstleistungs-URL im laufenden bzw. letzten Crawl (pending, done, failed)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    url: str = Field(sa_column=Column(String(512), unique=True, nullable=False))
+    status: str = Field(default="pending", index=True)
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = Field(default=None, sa_column=Column(Text))
+    started_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
+
+class Tombstone(SQLModel, table=True):
+    # Gelöschte Dienstleistungen und Formulare, damit /changes auch Löschungen melden kann
+    id: Optional[int] = Field(default=None, primary_key=True)
+    entity: str = Field(sa_column=Column(String(16), nullable=False))  # "service" oder "form"
+    entity_id: int
+    crawl_version: int = Field(index=True)
+    deleted_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,159 @@
+from bs4 import BeautifulSoup, SoupStrainer
+from app.metrics import scraper_parse_duration
+from config import config
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+SECTION_TITLES = {'Voraussetzungen', 'Erforderliche Unterlagen', 'Gebühren', 'Rechtsgrundlagen', 'Formulare'}
+
+
+def resolve_parser(name):
+    # lxml ist optional; ohne installiertes Paket wird auf html.parser zurückgegriffen
+    if name == 'lxml':
+        try:
+            import lxml  # noqa: F401
+        except ImportError:
+            logger.warning("lxml is not installed, falling back to html.parser")
+            return 'html.parser'
+    return name
+
+
+def content_strainer(region):
+    # "body", "div#id" oder "div.klasse": nur dieser Bereich wird aufgebaut; leer = ganzes Dokument
+    if not region:
+        return None
+    if "#" in region:
+        name, _, element_id = region.partition("#")
+        return SoupStrainer(name or True, id=element_id)
+    if "." in region:
+        name, _, class_name = region.partition(".")
+        return SoupStrainer(name or True, class_=class_name)
+    return SoupStrainer(region)
+
+
+settings = config[os.getenv("ENV", "development")]
+HTML_PARSER = resolve_parser(settings.SCRAPER_HTML_PARSER)
+CONTENT_STRAINER = content_strainer(settings.SCRAPER_CONTENT_REGION)
+
+
+# Function to extract content between sections
+def _section_content(header):
+    if header is None:
+        return ""
+    content = []
+    section = header.find_next_sibling()
+    while section and section.name != 'h2':
+        content.append(section.get_text(separator="\n").strip())
+        section = section.find_next_sibling()
+    return "\n".join(content)
+
+
+def _in_office_label(tag):
+    # Entspricht dem Selektor 'label.form-check-label strong'
+    for parent in tag.parents:
+        if parent.name == 'label' and 'form-check-label' in parent.get('class', ()):
+            return True
+    return False
+
+
+def extract_service_links(html):
+    soup = BeautifulSoup(html, HTML_PARSER)
+
+    # Debugging: HTML-Inhalt der Hauptseite ausgeben (prettify() nur, wenn DEBUG wirklich aktiv ist)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"HTML content of the main page: {soup.prettify()[:1000]}...")  # Nur die ersten 1000 Zeichen anzeigen
+
+    links = [str(link['href']) for link in soup.select('div.span7 a')]
+    soup.decompose()
+    return links
+
+
+def parse_service_page(html, url, parser=None, strainer=CONTENT_STRAINER):
+    start = time.perf_counter()
+    # Nur der Inhaltsbereich wird als Baum aufgebaut (ohne Kopf, Navigation, Skripte und Fußzeile)
+    soup = BeautifulSoup(html, parser or HTML_PARSER, parse_only=strainer)
+    if strainer is not None and soup.find('h1') is None:
+        # Bereich nicht gefunden (anderes Layout, mit html.parser auch ein fehlendes <body>): ganze Seite parsen
+        soup.decompose()
+        soup = BeautifulSoup(html, parser or HTML_PARSER)
+    try:
+        return _extract_service(soup, url)
+    finally:
+        # Zyklische Verweise im Baum auflösen, damit der Speicher sofort und nicht erst beim GC frei wird
+        soup.decompose()
+        scraper_parse_duration.observe(time.perf_counter() - start)
+
+
+def _extract_service(soup, url):
+    # Ein einziger Durchlauf über alle Tags: Titel, Abschnittsüberschriften, Behörden und Online-Link
+    title_element = None
+    headers = {}
+    responsible_offices = []
+    digital_service = False
+    for tag in soup.find_all(True):
+        if tag.name == 'h1':
+            if title_element is None:
+                title_element = tag
+        elif tag.name == 'h2':
+            section_title = tag.string
+            if section_title in SECTION_TITLES and section_title not in headers:
+                headers[str(section_title)] = tag
+        elif tag.name == 'strong':
+            if _in_office_label(tag):
+                responsible_offices.append(tag.get_text(strip=True))
+        elif tag.name == 'a':
+            if not digital_service and 'list-item-style' in tag.get('class', ()) and tag.get('title') == "Jetzt online erledigen":
+                digital_service = True
+
+    # Extracting the title
+    title = title_element.text.strip() if title_element else None
+
+    if title is None:
+        logger.error(f"NULL title found for URL: {url}")
+
+    # Extracting the desired information
+    voraussetzungen = _section_content(headers.get('Voraussetzungen'))
+    erforderliche_unterlagen = _section_content(headers.get('Erforderliche Unterlagen'))
+    gebuehren = _section_content(headers.get('Gebühren')) or "Keine Gebühren gefunden"
+    rechtsgrundlagen = _section_content(headers.get('Rechtsgrundlagen'))
+
+    formular_header = headers.get('Formulare')
+    formulare = []
+    if formular_header:
+        formular_list = formular_header.find_next_sibling('ul')
+        if formular_list:
+            formular_links = formular_list.find_all('a')
+            formulare = [{'title': link.text.strip(), 'url': link['href']} for link in formular_links]
+
+    zustaendiges_amt = ", ".join(responsible_offices)  # Join multiple offices with a comma
+
+    return {
+        "title": title,
+        "voraussetzungen": voraussetzungen,
+        "erforderliche_unterlagen": erforderliche_unterlagen,
+        "gebuehren": gebuehren,
+        "rechtsgrundlagen": rechtsgrundlagen,
+        "formulare": formulare,
+        "digital_service": digital_service,
+        "zustaendiges_amt": zustaendiges_amt,
+        "zustaendige_aemter": responsible_offices
+    }
+
+
+def decode_content(content, encoding):
+    # Rohe Bytes dekodieren wie requests' response.text,
+    # ohne bekannte Kodierung übernimmt BeautifulSoup die Erkennung
+    if not encoding:
+        return content
+    try:
+        return str(content, encoding, errors='replace')
+    except LookupError:
+        return str(content, errors='replace')
+
+
+def parse_service_content(content, encoding, url):
+    # Einstiegspunkt für Parse-Prozesse und das Abspielen des Archivs
+    return parse_service_page(decode_content(content, encoding), url)
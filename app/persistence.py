@@ -0,0 +1,323 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+from sqlalchemy import bindparam, delete, insert, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlmodel import select
+from app.catalogue import bump_catalogue_version
+from app.metrics import scraper_commit_duration
+from app.models import Service, Form, Office, ServiceOfficeLink, Tombstone
+import hashlib
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MAX_URL_LENGTH = 2048  # Setzen Sie die maximale Länge der URL
+
+# Extrahierte Felder, aus denen der data_hash einer Dienstleistung gebildet wird
+DATA_COLUMNS = [
+    "title",
+    "voraussetzungen",
+    "erforderliche_unterlagen",
+    "gebuehren",
+    "rechtsgrundlagen",
+    "digital_service",
+    "zustaendiges_amt",
+]
+
+# Spalten, die bei einem erneuten Crawl überschrieben werden (created_version bleibt erhalten)
+SERVICE_COLUMNS = DATA_COLUMNS + [
+    "etag",
+    "last_modified",
+    "content_hash",
+    "data_hash",
+    "updated_at",
+    "crawl_version",
+]
+
+
+def data_hash(values):
+    # Hash der extrahierten Felder statt der Seite: geänderte Skripte oder Layouts zählen nicht als Änderung
+    return hashlib.sha256(json.dumps(values, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def add_tombstones(session, entity, ids, version):
+    if ids:
+        now = datetime.now(timezone.utc)
+        session.execute(insert(Tombstone.__table__), [
+            {"entity": entity, "entity_id": entity_id, "crawl_version": version, "deleted_at": now} for entity_id in ids
+        ])
+
+
+def delete_services(session, service_ids, version):
+    # Dienstleistungen samt Formularen und Behörden-Zuordnungen löschen und für /changes vermerken
+    form_ids = list(session.exec(select(Form.id).where(Form.service_id.in_(service_ids))))
+    add_tombstones(session, "form", form_ids, version)
+    add_tombstones(session, "service", service_ids, version)
+    session.execute(delete(Form).where(Form.service_id.in_(service_ids)))
+    session.execute(delete(ServiceOfficeLink).where(ServiceOfficeLink.service_id.in_(service_ids)))
+    session.execute(delete(Service).where(Service.id.in_(service_ids)))
+
+
+def adopt_legacy_services(session, records):
+    # Dienstleistungen aus der Zeit vor source_url (NULL) über den Titel der neuen URL zuordnen,
+    # damit der Upsert sie aktualisiert statt eine zweite Kopie anzulegen (ids bleiben erhalten)
+    source_urls = [record["source_url"] for record in records]
+    known = set(session.exec(select(Service.source_url).where(Service.source_url.in_(source_urls))))
+    titles = {record["title"]: record["source_url"] for record in records if record["source_url"] not in known}
+    if not titles:
+        return
+    adopted = {}
+    for service_id, title in session.exec(
+        select(Service.id, Service.title)
+        .where(Service.source_url.is_(None), Service.title.in_(list(titles)))
+        .order_by(Service.id)
+    ):
+        adopted.setdefault(title, service_id)
+    if adopted:
+        table = Service.__table__
+        session.execute(
+            update(table).where(table.c.id == bindparam("b_id")),
+            [{"b_id": service_id, "source_url": titles[title]} for title, service_id in adopted.items()],
+        )
+
+
+def remove_missing_services(session, source_urls):
+    # Nach einem vollständigen Crawl: Dienstleistungen, die nicht mehr verlinkt sind, löschen. Dazu zählen
+    # Altbestände ohne source_url, die keiner URL zugeordnet werden konnten (z. B. doppelte Titel).
+    if not source_urls:
+        logger.warning("No service links found, skipping removal of missing services.")
+        return 0
+    linked = set(source_urls)
+    missing = [
+        service_id
+        for service_id, source_url in session.exec(select(Service.id, Service.source_url))
+        if source_url is None or source_url not in linked
+    ]
+    if not missing:
+        return 0
+    version = bump_catalogue_version(session)
+    delete_services(session, missing, version)
+    session.commit()
+    logger.info(f"Removed {len(missing)} services that are no longer listed.")
+    return len(missing)
+
+
+def split_offices(zustaendiges_amt):
+    # Rückfall für Datensätze, die nur die kommagetrennte Spalte kennen
+    return [name.strip() for name in (zustaendiges_amt or "").split(",") if name.strip()]
+
+
+def insert_ignore(session, table, rows):
+    # Zeilen einfügen, vorhandene Schlüssel überspringen
+    dialect = session.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(table).values(rows).prefix_with("IGNORE")
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(table).values(rows).on_conflict_do_nothing()
+    else:
+        raise NotImplementedError(f"Insert ignore is not supported for dialect {dialect}")
+    session.execute(stmt)
+
+
+def link_offices(session, offices_by_service):
+    # offices_by_service: {service_id: [Behördenname, ...]}; ersetzt die bisherigen Zuordnungen
+    names = {name for names in offices_by_service.values() for name in names}
+    if names:
+        insert_ignore(session, Office.__table__, [{"name": name} for name in sorted(names)])
+    office_ids = dict(session.exec(select(Office.name, Office.id).where(Office.name.in_(names))).all()) if names else {}
+
+    session.execute(delete(ServiceOfficeLink).where(ServiceOfficeLink.service_id.in_(list(offices_by_service))))
+    link_rows = [
+        {"service_id": service_id, "office_id": office_ids[name]}
+        for service_id, office_names in offices_by_service.items()
+        for name in dict.fromkeys(office_names)
+    ]
+    if link_rows:
+        session.execute(insert(ServiceOfficeLink.__table__), link_rows)
+
+
+def backfill_service_offices(session):
+    # Zuordnungen für bestehende Dienstleistungen aus zustaendiges_amt aufbauen
+    if session.exec(select(Office.id).limit(1)).first() is not None:
+        return
+    rows = session.exec(select(Service.id, Service.zustaendiges_amt).where(Service.zustaendiges_amt.is_not(None))).all()
+    offices_by_service = {service_id: split_offices(amt) for service_id, amt in rows}
+    if offices_by_service:
+        link_offices(session, offices_by_service)
+        session.commit()
+
+
+def upsert_services(session, rows):
+    # INSERT ... ON DUPLICATE KEY UPDATE (MySQL) bzw. ON CONFLICT (SQLite), Schlüssel ist source_url
+    table = Service.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in SERVICE_COLUMNS})
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["source_url"],
+            set_={column: stmt.excluded[column] for column in SERVICE_COLUMNS},
+        )
+    else:
+        raise NotImplementedError(f"Upsert is not supported for dialect {dialect}")
+    session.execute(stmt)
+
+
+class ServiceWriter:
+    # Sammelt geparste Dienstleistungen und schreibt sie stapelweise in einer Session
+    def __init__(self, session, batch_size=100):
+        self.session = session
+        self.batch_size = batch_size
+        self.pending = []
+        self.services_written = 0
+        self.forms_written = 0
+        # Geänderte, neue und gelöschte Zeilen; 0 = Katalog unverändert (keine neue Version, kein neuer Snapshot)
+        self.changes = 0
+        # Zusätzliche Schreibvorgänge im selben Commit (z. B. CrawlJobTracker.write)
+        self.before_commit = []
+
+    def add(self, service_url, service_data, page=None):
+        page = page or {}
+        self.pending.append({
+            "source_url": service_url,
+            "title": service_data['title'],
+            "voraussetzungen": service_data['voraussetzungen'],
+            "erforderliche_unterlagen": service_data['erforderliche_unterlagen'],
+            "gebuehren": service_data['gebuehren'],
+            "rechtsgrundlagen": service_data['rechtsgrundlagen'],
+            "digital_service": service_data['digital_service'],
+            "zustaendiges_amt": service_data['zustaendiges_amt'],
+            "etag": page.get('etag'),
+            "last_modified": page.get('last_modified'),
+            "content_hash": page.get('content_hash'),
+            "formulare": service_data['formulare'],
+            "zustaendige_aemter": service_data.get('zustaendige_aemter', split_offices(service_data['zustaendiges_amt'])),
+        })
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        # Doppelte Links innerhalb eines Stapels: der letzte Stand gewinnt
+        batch = list({record["source_url"]: record for record in self.pending}.values())
+        self.pending = []
+        start = time.perf_counter()
+
+        now = datetime.now(timezone.utc)
+        adopt_legacy_services(self.session, batch)
+
+        source_urls = [record["source_url"] for record in batch]
+        existing = {
+            source_url: (hash_value, updated_at, crawl_version)
+            for source_url, hash_value, updated_at, crawl_version in self.session.exec(
+                select(Service.source_url, Service.data_hash, Service.updated_at, Service.crawl_version)
+                .where(Service.source_url.in_(source_urls))
+            )
+        }
+        service_rows, changed_urls = [], []
+        for record in batch:
+            row = {key: value for key, value in record.items() if key not in ("formulare", "zustaendige_aemter")}
+            row["data_hash"] = data_hash({column: row[column] for column in DATA_COLUMNS})
+            previous = existing.get(row["source_url"])
+            if previous is not None and previous[0] == row["data_hash"]:
+                # Inhalt unverändert: Änderungszeitpunkt und -version bleiben
+                row["updated_at"], row["crawl_version"] = previous[1], previous[2]
+            else:
+                changed_urls.append(row["source_url"])
+            service_rows.append(row)
+
+        # Neue Katalogversion nur bei tatsächlichen Änderungen, im selben Commit, damit API-Caches verworfen
+        # werden. Geänderte Zeilen erhalten sie als crawl_version; die Sperre auf der Versionszeile hält
+        # parallele Writer an. Unveränderte Stapel schreiben nur die Cache-Validatoren der Seiten.
+        version = bump_catalogue_version(self.session) if changed_urls else None
+        changed = set(changed_urls)
+        for row in service_rows:
+            if row["source_url"] in changed:
+                row["updated_at"], row["crawl_version"] = now, version
+            row["created_version"] = version or 0  # nur beim Einfügen verwendet, dann immer gesetzt
+        upsert_services(self.session, service_rows)
+
+        service_ids = dict(self.session.exec(
+            select(Service.source_url, Service.id).where(Service.source_url.in_(source_urls))
+        ).all())
+
+        inserts, updates, removed, form_count = self.plan_forms(batch, service_ids)
+        form_changes = len(inserts) + len(updates) + len(removed)
+        if form_changes:
+            if version is None:
+                version = bump_catalogue_version(self.session)
+            self.write_forms(inserts, updates, removed, version, now)
+
+        # Behörden hängen an zustaendiges_amt und damit am data_hash
+        link_offices(self.session, {
+            service_ids[record["source_url"]]: record["zustaendige_aemter"] for record in batch
+            if record["source_url"] in changed
+        })
+
+        for callback in self.before_commit:
+            callback()
+        self.session.commit()
+        scraper_commit_duration.observe(time.perf_counter() - start)
+        self.services_written += len(batch)
+        self.forms_written += form_count
+        self.changes += len(changed_urls) + form_changes
+        logger.info(f"Committed {len(batch)} services and {form_count} forms to the database "
+                    f"({len(changed_urls)} services and {form_changes} forms changed).")
+
+    def plan_forms(self, batch, service_ids):
+        # Formulare je Dienstleistung über die URL abgleichen, damit ihre ids stabil bleiben:
+        # neue einfügen, geänderte Titel aktualisieren, verschwundene löschen
+        existing = defaultdict(list)
+        for form_id, service_id, url, hash_value in self.session.exec(
+            select(Form.id, Form.service_id, Form.url, Form.data_hash)
+            .where(Form.service_id.in_(list(service_ids.values())))
+            .order_by(Form.id)
+        ):
+            existing[(service_id, url)].append((form_id, hash_value))
+
+        inserts, updates, form_count = [], [], 0
+        for record in batch:
+            service_id = service_ids[record["source_url"]]
+            for form_data in record["formulare"]:
+                if form_data['title'] is None:
+                    logger.error(f"NULL title found for form URL: {form_data['url']} in service URL: {record['source_url']}")
+                    continue
+                if len(form_data['url']) > MAX_URL_LENGTH:
+                    logger.error(f"URL too long for form URL: {form_data['url']} in service URL: {record['source_url']}")
+                    continue
+                form_count += 1
+                hash_value = data_hash({"title": form_data['title'], "url": form_data['url']})
+                matches = existing.get((service_id, form_data['url']))
+                if matches:
+                    form_id, previous_hash = matches.pop(0)
+                    if previous_hash != hash_value:
+                        updates.append({"b_id": form_id, "title": form_data['title'], "data_hash": hash_value})
+                    continue
+                inserts.append({
+                    "title": form_data['title'],
+                    "url": form_data['url'],
+                    "service_id": service_id,
+                    "data_hash": hash_value,
+                })
+
+        removed = [form_id for matches in existing.values() for form_id, _ in matches]
+        return inserts, updates, removed, form_count
+
+    def write_forms(self, inserts, updates, removed, version, now):
+        for row in updates:
+            row.update(updated_at=now, crawl_version=version)
+        for row in inserts:
+            row.update(updated_at=now, created_version=version, crawl_version=version)
+        if removed:
+            add_tombstones(self.session, "form", removed, version)
+            self.session.execute(delete(Form).where(Form.id.in_(removed)))
+        if updates:
+            table = Form.__table__
+            self.session.execute(update(table).where(table.c.id == bindparam("b_id")), updates)
+        if inserts:
+            self.session.execute(insert(Form.__table__), inserts)
@@ -0,0 +1,78 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from app.metrics import scraper_parse_duration
+from app.parser import parse_service_content
+import time
+
+
+def parse_timed(content, encoding, url):
+    # Läuft im Parse-Prozess; die Dauer wird zurückgegeben und im Hauptprozess erfasst
+    start = time.perf_counter()
+    data = parse_service_content(content, encoding, url)
+    return data, time.perf_counter() - start
+
+
+def iter_bounded(items, function, workers, max_pending):
+    # function(item) in Threads; höchstens max_pending Ergebnisse unterwegs, Ausgabe in Eingabereihenfolge.
+    # executor.map() würde alle Elemente sofort einreihen und sämtliche Ergebnisse im Speicher halten.
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append((item, executor.submit(function, item)))
+            if len(pending) >= max_pending:
+                queued, future = pending.popleft()
+                yield queued, future.result()
+        while pending:
+            queued, future = pending.popleft()
+            yield queued, future.result()
+
+
+def iter_service_pages(service_urls, fetch_page, fetch_workers, parse_workers, max_pending):
+    # Abrufen in Threads, Parsen in Prozessen. Höchstens max_pending Seiten sind gleichzeitig
+    # unterwegs (Backpressure); die Ergebnisse kommen in der Reihenfolge der Links zurück.
+    # fetch_page(url) liefert die Seite mit den rohen Bytes unter "content"/"encoding".
+    with ProcessPoolExecutor(max_workers=parse_workers) as parse_pool, \
+            ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool:
+        pending = deque()
+        urls = iter(service_urls)
+
+        def submit(service_url):
+            done = Future()
+
+            def on_parsed(parse_future, page):
+                try:
+                    page['data'], elapsed = parse_future.result()
+                    scraper_parse_duration.observe(elapsed)
+                except BaseException as e:
+                    done.set_exception(e)
+                    return
+                done.set_result(page)
+
+            def on_fetched(fetch_future):
+                try:
+                    page = fetch_future.result()
+                    if not page or page['unchanged'] or page.get('error'):
+                        done.set_result(page)
+                        return
+                    content, encoding = page.pop('content'), page.pop('encoding')
+                    parse_future = parse_pool.submit(parse_timed, content, encoding, service_url)
+                except BaseException as e:
+                    done.set_exception(e)
+                    return
+                parse_future.add_done_callback(lambda f: on_parsed(f, page))
+
+            fetch_pool.submit(fetch_page, service_url).add_done_callback(on_fetched)
+            pending.append((service_url, done))
+
+        for service_url in urls:
+            submit(service_url)
+            if len(pending) >= max_pending:
+                break
+
+        while pending:
+            service_url, done = pending.popleft()
+            page = done.result()
+            for next_url in urls:
+                submit(next_url)
+                break
+            yield service_url, page
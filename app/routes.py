@@ -1,16 +1,189 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlmodel import func, select
+from sqlmodel.sql.expression import Select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
-from app.db import get_session
-from app.models import Service, Form, User
+from app.db import get_async_db, get_async_session, get_session
+from app.models import CHANGE_FORM_FIELDS, CHANGE_SERVICE_FIELDS, SERVICE_FIELDS, Service, Form, Office, ServiceOfficeLink, Tombstone, User
 from app.auth import authenticate_user, create_access_token, get_current_active_user
+from app.cache import CatalogueVersionTracker, TTLCache
+from app.catalogue import get_catalogue_version
+from app.compression import EncodedBody, dumps
+from app.metrics import render as render_metrics
+from app.search import SearchIndexStore
+from config import config
 from typing import Optional, List
+import os
 
 router = APIRouter()
 
+settings = config[os.getenv("ENV", "development")]
+
+# Antwort-Cache für die Katalog-Endpunkte, ungültig sobald der Scraper eine neue Katalogversion schreibt
+response_cache = TTLCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL)
+catalogue_version = CatalogueVersionTracker(settings.CACHE_VERSION_CHECK_INTERVAL)
+catalogue_version.on_change(lambda version: response_cache.clear())
+# Ungefilterte Listen (z. B. /ALL-SERVICES ohne Parameter): pro Pfad einmal je Katalogversion
+# serialisiert und komprimiert, unabhängig von TTL und LRU des Antwort-Caches
+precomputed_responses = {}
+
+search_index = SearchIndexStore(settings.SEARCH_INDEX_PATH, get_session)
+
+STREAM_BATCH_SIZE = 500  # Zeilen pro Chunk beim Streamen
+
+def apply_keyset(statement, model, after: Optional[int], limit: Optional[int]):
+    # Keyset-Pagination über die id statt OFFSET
+    statement = statement.order_by(model.id)
+    if after is not None:
+        statement = statement.where(model.id > after)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+def next_cursor_headers(rows, limit: Optional[int]) -> dict:
+    # Volle Seite: der Client setzt mit after=<X-Next-Cursor> fort
+    if limit is not None and len(rows) == limit:
+        last = rows[-1]
+        return {"X-Next-Cursor": str(last["id"] if isinstance(last, dict) else last.id)}
+    return {}
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    # fields=title,gebuehren: nur diese Spalten (plus id) abfragen; ohne fields alle öffentlichen Felder
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SERVICE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return ["id"] + [name for name in dict.fromkeys(names) if name != "id"]
+
+def parse_include(include: Optional[str]) -> bool:
+    # include=forms: Formulare in derselben Antwort mitliefern
+    names = {name.strip() for name in (include or "").split(",") if name.strip()}
+    unknown = names - {"forms"}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(sorted(unknown))}")
+    return "forms" in names
+
+def service_statement(fields: Optional[List[str]]):
+    # Immer eine Spaltenauswahl, damit interne Crawl-Spalten nie in einer Antwort landen. Select statt select():
+    # auch bei nur einer Spalte (fields=id) liefert db.exec() dann Zeilen statt Skalare.
+    return Select(*(Service.__table__.c[name] for name in fields or SERVICE_FIELDS))
+
+def serialize_form(form) -> dict:
+    return {"id": form.id, "title": form.title, "url": form.url}
+
+async def serialize_services(session, rows, fields: Optional[List[str]], include_forms: bool):
+    # rows stammen aus session.exec() mit einer Abfrage auf Basis von service_statement()
+    services = [dict(row._mapping) for row in rows]
+    if include_forms and services:
+        # Eine zusätzliche SELECT ... WHERE service_id IN (...) statt einer Abfrage pro Dienstleistung
+        forms = {}
+        statement = select(Form).where(Form.service_id.in_([service["id"] for service in services])).order_by(Form.id)
+        for form in await session.exec(statement):
+            forms.setdefault(form.service_id, []).append(serialize_form(form))
+        for service in services:
+            service["forms"] = forms.get(service["id"], [])
+    return services
+
+def change_feed(since: int, version: int, services, forms, tombstones) -> dict:
+    # services/forms: seit since angelegte oder geänderte Datensätze; tombstones: (entity, entity_id)
+    deleted = {"service": [], "form": []}
+    for entity, entity_id in tombstones:
+        deleted[entity].append(entity_id)
+
+    def split(records, entity, fields):
+        return {
+            "inserted": [{name: record.get(name) for name in fields} for record in records if record["created_version"] > since],
+            "updated": [{name: record.get(name) for name in fields} for record in records if record["created_version"] <= since],
+            "deleted": deleted[entity],
+        }
+
+    return {
+        "since": since,
+        "version": version,
+        "services": split(services, "service", CHANGE_SERVICE_FIELDS),
+        "forms": split(forms, "form", CHANGE_FORM_FIELDS),
+    }
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return etag in candidates or "*" in candidates
+
+async def cached_response(request: Request, build, version: Optional[int] = None, precompute: bool = False):
+    # build() liefert (Inhalt, Header); gespeichert werden die fertig serialisierten und komprimierten Bytes.
+    # Ohne version gilt die Katalogversion aus der Datenbank (im Snapshot-Modus die des Snapshots).
+    # precompute: Listen-Endpunkt, dessen ungefilterte Antwort vorab in allen Kodierungen komprimiert wird.
+    if version is None:
+        version = await catalogue_version.current()
+    static = precompute and not request.query_params
+    if static:
+        cached = precomputed_responses.get(request.url.path)
+        entry = cached[1] if cached and cached[0] == version else None
+    else:
+        key = (version, request.url.path, tuple(sorted(request.query_params.multi_items())))
+        entry = response_cache.get(key)
+    if entry is None:
+        content, headers = await build()
+        body = dumps(content)
+        if static:
+            entry = await run_in_threadpool(EncodedBody, body, headers, settings.COMPRESSION_MIN_SIZE, True)
+            precomputed_responses[request.url.path] = (version, entry)
+        else:
+            entry = EncodedBody(body, headers, settings.COMPRESSION_MIN_SIZE)
+            response_cache.set(key, entry)
+
+    encoding = entry.choose(request.headers.get("accept-encoding"))
+    headers = entry.headers_for(encoding)
+    if any(etag_matches(request.headers.get("if-none-match"), etag) for etag in entry.etags):
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return Response(entry.body, media_type="application/json", headers=headers)
+    if encoding in entry.variants:
+        body = entry.variants[encoding]
+    else:
+        body = await run_in_threadpool(entry.variant, encoding)
+    return Response(body, media_type="application/json", headers=headers)
+
+def streaming_response(batches, stream_format: str):
+    # batches: asynchroner Iterator über Blöcke serialisierbarer Datensätze, ausgegeben als NDJSON oder JSON-Array
+    async def generate():
+        first = True
+        if stream_format == "json":
+            yield b"["
+        async for items in batches:
+            encoded = [dumps(item) for item in items]
+            if stream_format == "ndjson":
+                yield b"".join(line + b"\n" for line in encoded)
+            else:
+                yield (b"" if first else b",") + b",".join(encoded)
+            first = False
+        if stream_format == "json":
+            yield b"]"
+
+    media_type = "application/x-ndjson" if stream_format == "ndjson" else "application/json"
+    return StreamingResponse(generate(), media_type=media_type)
+
+def stream_rows(statement, serialize, stream_format: str):
+    # Zeilen direkt vom serverseitigen Cursor ausgeben;
+    # await serialize(session, rows) wandelt jeweils einen Block von Zeilen um.
+    # Zusätzliche Abfragen in serialize (include=forms) laufen über eine zweite Session: bei MySQL belegt
+    # der offene Cursor (SSCursor) die Verbindung, eine weitere Abfrage darauf würde ihn abbrechen.
+    async def batches():
+        async with get_async_session() as session, get_async_session() as lookup_session:
+            result = await session.stream(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for rows in result.partitions():
+                yield await serialize(lookup_session, rows)
+
+    return streaming_response(batches(), stream_format)
+
 @router.post("/token", response_model=dict)
-def login_for_access_token(db: Session = Depends(get_session), form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(db: AsyncSession = Depends(get_async_db), form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -21,44 +194,169 @@ def login_for_access_token(db: Session = Depends(get_session), form_data: OAuth2
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/users/me/", response_model=User)
-def read_users_me(current_user: User = Depends(get_current_active_user)):
+async def read_users_me(current_user: User = Depends(get_current_active_user)):
     return current_user
 
 @router.get("/services/")
-def read_services(skip: int = 0, limit: int = 10, db: Session = Depends(get_session)):
-    services = db.query(Service).offset(skip).limit(limit).all()
+async def read_services(
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    after: Optional[int] = None,
+    include: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    fields, include_forms = parse_fields(fields), parse_include(include)
+    # skip bleibt für bestehende Clients erhalten, after ist bei tiefen Seiten deutlich schneller
+    statement = apply_keyset(service_statement(fields), Service, after, limit)
+    if after is None and skip:
+        statement = statement.offset(skip)
+    services = await serialize_services(db, (await db.exec(statement)).all(), fields, include_forms)
+    response.headers.update(next_cursor_headers(services, limit))
     return services
 
 @router.get("/ALL-SERVICES")
-def get_all_services(
+async def get_all_services(
+    request: Request,
     digital_service: Optional[bool] = Query(None, alias="DIGITAL-SERVICE"),
     responsible_office: Optional[str] = Query(None, alias="RESPONSIBLE-OFFICE"),
-    db: Session = Depends(get_session)
+    after: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    stream: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    include: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Service)
+    fields, include_forms = parse_fields(fields), parse_include(include)
+    statement = service_statement(fields)
     
     if digital_service is not None:
-        query = query.filter(Service.digital_service == digital_service)
+        statement = statement.where(Service.digital_service == digital_service)
     
     if responsible_office:
-        query = query.filter(Service.zustaendiges_amt == responsible_office)
-    
-    services = query.all()
-    return services
+        # Indizierter Join über die Behörden-Tabelle; findet auch Dienstleistungen mit mehreren Behörden
+        statement = (
+            statement.join(ServiceOfficeLink, ServiceOfficeLink.service_id == Service.id)
+            .join(Office, Office.id == ServiceOfficeLink.office_id)
+            .where(Office.name == responsible_office)
+        )
+
+    statement = apply_keyset(statement, Service, after, limit)
+    if stream:
+        return stream_rows(statement, lambda session, rows: serialize_services(session, rows, fields, include_forms), stream)
+
+    async def build():
+        services = await serialize_services(db, (await db.exec(statement)).all(), fields, include_forms)
+        return services, next_cursor_headers(services, limit)
+
+    return await cached_response(request, build, precompute=True)
 
 @router.get("/ALL-SERVICES", response_model=List[dict])
-def get_all_service_titles(db: Session = Depends(get_session)):
-    services = db.query(Service).all()
+async def get_all_service_titles(db: AsyncSession = Depends(get_async_db)):
+    services = (await db.exec(select(Service))).all()
     return [{"id": service.id, "title": service.title} for service in services]
 
-@router.get("/SERVICE/{service_id}", response_model=Service)
-def get_service(service_id: int, db: Session = Depends(get_session)):
-    service = db.query(Service).filter(Service.id == service_id).first()
-    if not service:
-        raise HTTPException(status_code=404, detail="Service not found")
-    return service
+@router.get("/SERVICE/{service_id}", response_model=dict)
+async def get_service(
+    request: Request,
+    service_id: int,
+    include: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    fields, include_forms = parse_fields(fields), parse_include(include)
+    statement = service_statement(fields).where(Service.id == service_id)
+
+    async def build():
+        services = await serialize_services(db, (await db.exec(statement)).all(), fields, include_forms)
+        if not services:
+            raise HTTPException(status_code=404, detail="Service not found")
+        return services[0], {}
+
+    return await cached_response(request, build)
 
 @router.get("/ALL-FORMS", response_model=List[dict])
-def get_all_forms(db: Session = Depends(get_session)):
-    forms = db.query(Form).all()
-    return [{"id": form.id, "title": form.title, "url": form.url} for form in forms]
\ No newline at end of file
+async def get_all_forms(
+    request: Request,
+    after: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    stream: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    statement = apply_keyset(select(Form.id, Form.title, Form.url), Form, after, limit)
+    async def serialize_forms(session, rows):
+        return [serialize_form(form) for form in rows]
+
+    if stream:
+        return stream_rows(statement, serialize_forms, stream)
+
+    async def build():
+        forms = (await db.exec(statement)).all()
+        return await serialize_forms(db, forms), next_cursor_headers(forms, limit)
+
+    return await cached_response(request, build, precompute=True)
+
+@router.get("/OFFICES", response_model=List[dict])
+async def get_offices(
+    request: Request,
+    digital_service: Optional[bool] = Query(None, alias="DIGITAL-SERVICE"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Facette für RESPONSIBLE-OFFICE: alle Behörden mit der Anzahl ihrer Dienstleistungen
+    statement = (
+        select(Office.id, Office.name, func.count(ServiceOfficeLink.service_id).label("services"))
+        .join(ServiceOfficeLink, ServiceOfficeLink.office_id == Office.id)
+        .group_by(Office.id, Office.name)
+        .order_by(Office.name)
+    )
+    if digital_service is not None:
+        statement = (
+            statement.join(Service, Service.id == ServiceOfficeLink.service_id)
+            .where(Service.digital_service == digital_service)
+        )
+
+    async def build():
+        offices = (await db.exec(statement)).all()
+        return [{"id": office.id, "name": office.name, "services": office.services} for office in offices], {}
+
+    return await cached_response(request, build, precompute=True)
+
+@router.get("/changes")
+async def get_changes(
+    request: Request,
+    since: int = Query(..., ge=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Delta für Spiegel: seit der Katalogversion since angelegte, geänderte und gelöschte Datensätze.
+    # Der Client fragt beim nächsten Mal mit der zurückgegebenen version an.
+    async def build():
+        # Version zuerst lesen und nach oben begrenzen: spätere Commits landen im nächsten Abruf
+        version = await db.run_sync(get_catalogue_version)
+        services = (await db.exec(
+            select(Service).where(Service.crawl_version > since, Service.crawl_version <= version).order_by(Service.id)
+        )).all()
+        forms = (await db.exec(
+            select(Form).where(Form.crawl_version > since, Form.crawl_version <= version).order_by(Form.id)
+        )).all()
+        tombstones = (await db.exec(
+            select(Tombstone.entity, Tombstone.entity_id)
+            .where(Tombstone.crawl_version > since, Tombstone.crawl_version <= version)
+            .order_by(Tombstone.id)
+        )).all()
+        services = [service.model_dump() for service in services]
+        forms = [form.model_dump() for form in forms]
+        return change_feed(since, version, services, forms, tombstones), {}
+
+    return await cached_response(request, build)
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    # Prometheus-Textformat; enthält auch die Metriken der Datenbank-Engines
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.get("/search", response_model=List[dict])
+def search_services(q: str = Query(..., min_length=2), limit: int = Query(10, ge=1, le=100)):
+    # Volltextsuche über Titel, Voraussetzungen, Unterlagen, Gebühren und Rechtsgrundlagen;
+    # bewusst synchron, damit das Laden des Index im Threadpool statt in der Event-Loop läuft
+    return search_index.get().search(q, limit)
@@ -1,147 +1,345 @@
 import requests
 from requests.exceptions import RequestException, Timeout
-from bs4 import BeautifulSoup
-from app.models import Service, Form
+from sqlmodel import select
+from app.models import Service
 from app.db import get_session
+from app.archive import ArchiveError, PageArchive
+from app.fetcher import Fetcher
+from app.parser import decode_content, extract_service_links, parse_service_content, parse_service_page
+from app.pipeline import iter_bounded, iter_service_pages
+from app.persistence import ServiceWriter, remove_missing_services
+from app.catalogue import get_catalogue_version
+from app.jobs import CrawlJobTracker, DONE, FAILED
+from app.links import check_form_links, create_link_fetcher
+from app.metrics import scraper_pages, write_textfile
+from app.search import build_search_index
+from app.snapshot import build_snapshot, save_snapshot
+from config import config
+from datetime import datetime, timezone
+import hashlib
 import logging
+import os
 from tqdm import tqdm
+import argparse
 
 # Konfigurieren Sie das Logging
 logging.basicConfig(level=logging.WARNING)  # Ändern Sie das Level zu WARNING, um weniger detaillierte Informationen auszugeben
 logger = logging.getLogger(__name__)
 
-MAX_URL_LENGTH = 2048  # Setzen Sie die maximale Länge der URL
+settings = config[os.getenv("ENV", "development")]
+
+BASE_URL = "https://service.berlin.de/dienstleistungen/"
+
+_default_fetcher = None
+
+def create_fetcher(concurrency=None):
+    return Fetcher(
+        concurrency=concurrency or settings.SCRAPER_CONCURRENCY,
+        rate_limit=settings.SCRAPER_RATE_LIMIT,
+        max_retries=settings.SCRAPER_MAX_RETRIES,
+        backoff_factor=settings.SCRAPER_BACKOFF_FACTOR,
+        timeout=settings.SCRAPER_TIMEOUT,
+    )
+
+def extract_info(url, fetcher=None):
+    global _default_fetcher
+    if fetcher is None:
+        if _default_fetcher is None:
+            _default_fetcher = create_fetcher(concurrency=1)
+        fetcher = _default_fetcher
 
-def extract_info(url):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
+        response = fetcher.get(url)
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching the URL: {e}")
         return None
 
-    soup = BeautifulSoup(response.text, 'html.parser')
+    return parse_service_page(response.text, url)
 
-    # Extracting the title
-    title_element = soup.find('h1')
-    title = title_element.text.strip() if title_element else None
+def fetch_service_page(url, fetcher, page_state=None, parse=True, archive=None):
+    # Bedingter GET: unveränderte Seiten (304 oder gleicher Inhalts-Hash) werden nicht geparst.
+    # Fehlt die Seite noch im Archiv, wird sie unbedingt abgerufen, damit ein 304 sie nicht auslässt.
+    headers = {}
+    if page_state and (archive is None or archive.latest(url) is not None):
+        if page_state['etag']:
+            headers['If-None-Match'] = page_state['etag']
+        if page_state['last_modified']:
+            headers['If-Modified-Since'] = page_state['last_modified']
 
-    if title is None:
-        logger.error(f"NULL title found for URL: {url}")
+    started_at = datetime.now(timezone.utc)
+    try:
+        response = fetcher.get(url, headers=headers)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching the URL: {e}")
+        return {"url": url, "unchanged": False, "data": None, "error": str(e), "started_at": started_at}
 
-    # Function to extract content between sections
-    def extract_section_content(header):
-        content = []
-        section = header.find_next_sibling()
-        while section and section.name != 'h2':
-            content.append(section.get_text(separator="\n").strip())
-            section = section.find_next_sibling()
-        return "\n".join(content)
+    if response.status_code == 304:
+        return {"url": url, "unchanged": True, "data": None, "started_at": started_at}
 
-    # Extracting the desired information
-    voraussetzungen_header = soup.find('h2', string='Voraussetzungen')
-    voraussetzungen = extract_section_content(voraussetzungen_header)
+    if archive is not None:
+        archive.store(url, response.content, response.encoding,
+                      response.headers.get('ETag'), response.headers.get('Last-Modified'))
 
-    unterlagen_header = soup.find('h2', string='Erforderliche Unterlagen')
-    erforderliche_unterlagen = extract_section_content(unterlagen_header)
+    content_hash = hashlib.sha256(response.content).hexdigest()
+    if page_state and page_state['content_hash'] == content_hash:
+        return {"url": url, "unchanged": True, "data": None, "started_at": started_at}
 
-    gebuehren_header = soup.find('h2', string='Gebühren')
-    gebuehren = extract_section_content(gebuehren_header) or "Keine Gebühren gefunden"
+    page = {
+        "url": url,
+        "unchanged": False,
+        "data": None,
+        "etag": response.headers.get('ETag'),
+        "last_modified": response.headers.get('Last-Modified'),
+        "content_hash": content_hash,
+        "started_at": started_at,
+    }
+    if parse:
+        page['data'] = parse_service_page(response.text, url)
+    else:
+        # Rohe Bytes für die separate Parse-Stufe
+        page['content'] = response.content
+        page['encoding'] = response.encoding
+    return page
 
-    rechtsgrundlagen_header = soup.find('h2', string='Rechtsgrundlagen')
-    rechtsgrundlagen = extract_section_content(rechtsgrundlagen_header)
+def load_archived_page(url, archive, parse=True):
+    started_at = datetime.now(timezone.utc)
+    entry = archive.latest(url)
+    if entry is None:
+        logger.error(f"URL not found in archive: {url}")
+        return {"url": url, "unchanged": False, "data": None, "error": "not found in archive", "started_at": started_at}
 
-    formular_header = soup.find('h2', string='Formulare')
-    formulare = []
-    if formular_header:
-        formular_list = formular_header.find_next_sibling('ul')
-        if formular_list:
-            formular_links = formular_list.find_all('a')
-            formulare = [{'title': link.text.strip(), 'url': link['href']} for link in formular_links]
+    try:
+        content = archive.read(entry)
+    except ArchiveError as e:
+        logger.error(str(e))
+        return {"url": url, "unchanged": False, "data": None, "error": str(e), "started_at": started_at}
+    page = {
+        "url": url,
+        "unchanged": False,
+        "data": None,
+        "etag": entry['etag'],
+        "last_modified": entry['last_modified'],
+        "content_hash": entry['sha256'],
+        "started_at": started_at,
+    }
+    if parse:
+        page['data'] = parse_service_content(content, entry['encoding'], url)
+    else:
+        page['content'] = content
+        page['encoding'] = entry['encoding']
+    return page
 
-    # Extracting the responsible offices
-    responsible_offices = []
-    for label in soup.select('label.form-check-label strong'):
-        responsible_offices.append(label.get_text(strip=True))
-    zustaendiges_amt = ", ".join(responsible_offices)  # Join multiple offices with a comma
+def iter_pages(service_urls, load_page, concurrency=1, parse_workers=0):
+    # Liefert die Seiten in der Reihenfolge der Links, auch bei paralleler Ausführung
+    if parse_workers > 0:
+        yield from iter_service_pages(
+            service_urls, lambda service_url: load_page(service_url, parse=False),
+            concurrency, parse_workers, settings.SCRAPER_QUEUE_SIZE
+        )
+        return
+
+    if concurrency <= 1:
+        for service_url in service_urls:
+            yield service_url, load_page(service_url)
+        return
+
+    # Höchstens SCRAPER_QUEUE_SIZE Seiten gleichzeitig unterwegs, auch wenn die Datenbank langsamer ist
+    yield from iter_bounded(service_urls, load_page, concurrency, settings.SCRAPER_QUEUE_SIZE)
+
+def fetch_services(service_urls, fetcher, concurrency=1, page_states=None, parse_workers=0, archive=None):
+    page_states = page_states or {}
 
-    # Überprüfen, ob der Link "Jetzt online erledigen" vorhanden ist
-    digital_service = bool(soup.select_one('a.list-item-style[title="Jetzt online erledigen"]'))
+    def load_page(service_url, parse=True):
+        return fetch_service_page(service_url, fetcher, page_states.get(service_url), parse, archive)
 
+    yield from iter_pages(service_urls, load_page, concurrency, parse_workers)
+
+def replay_services(service_urls, archive, parse_workers=0):
+    # Seiten aus dem lokalen Archiv statt von service.berlin.de
+    def load_page(service_url, parse=True):
+        return load_archived_page(service_url, archive, parse)
+
+    yield from iter_pages(service_urls, load_page, 1, parse_workers)
+
+def load_page_states():
+    # ETag, Last-Modified und Inhalts-Hash der bereits gespeicherten Dienstleistungen
+    with get_session() as session:
+        rows = session.exec(
+            select(Service.source_url, Service.etag, Service.last_modified, Service.content_hash)
+            .where(Service.source_url.is_not(None))
+        ).all()
     return {
-        "title": title,
-        "voraussetzungen": voraussetzungen,
-        "erforderliche_unterlagen": erforderliche_unterlagen,
-        "gebuehren": gebuehren,
-        "rechtsgrundlagen": rechtsgrundlagen,
-        "formulare": formulare,
-        "digital_service": digital_service,
-        "zustaendiges_amt": zustaendiges_amt
+        source_url: {"etag": etag, "last_modified": last_modified, "content_hash": content_hash}
+        for source_url, etag, last_modified, content_hash in rows
     }
 
-def crawl_data():
-    base_url = "https://service.berlin.de/dienstleistungen/"
+def fetch_index(fetcher, archive):
     try:
-        response = requests.get(base_url, timeout=10)
-        response.raise_for_status()
+        response = fetcher.get(BASE_URL)
     except (RequestException, Timeout) as e:
         logger.error(f"Error fetching the main page: {e}")
-        return
+        return None
+    if archive is not None:
+        archive.store(BASE_URL, response.content, response.encoding)
+    return response.text
+
+def select_service_urls(tracker, fetcher, archive, replay, urls=None, failed=False, restart=False):
+    # Welche URLs dieser Lauf bearbeitet: eine Auswahl, die fehlgeschlagenen, die offenen eines
+    # abgebrochenen Crawls oder alle Links der Übersichtsseite. Liefert (URLs, vollständiger Crawl).
+    # Ein Replay setzt nie einen abgebrochenen Live-Crawl fort, sondern liest die Links aus dem Archiv.
+    if failed:
+        return tracker.start(tracker.failed_urls(), full=False), False
+    if urls:
+        return tracker.start(urls, full=False), False
 
-    soup = BeautifulSoup(response.text, 'html.parser')
+    if not restart and not replay:
+        resumed = tracker.resumable_urls()
+        if resumed:
+            logger.warning(f"Resuming interrupted crawl with {len(resumed)} pending or failed URLs.")
+            return resumed, False
 
-    # Debugging: HTML-Inhalt der Hauptseite ausgeben
-    logger.debug(f"HTML content of the main page: {soup.prettify()[:1000]}...")  # Nur die ersten 1000 Zeichen anzeigen
+    if replay:
+        entry = archive.latest(BASE_URL)
+        if entry is None:
+            logger.error(f"Main page not found in archive: {replay}")
+            return None, False
+        index_html = decode_content(archive.read(entry), entry['encoding'])
+    else:
+        index_html = fetch_index(fetcher, archive)
+        if index_html is None:
+            return None, False
 
-    services = []
-    service_links = soup.select('div.span7 a')
-    logger.info(f"Found {len(service_links)} service links.")
+    service_urls = extract_service_links(index_html)
+    logger.info(f"Found {len(service_urls)} service links.")
+    return tracker.start(service_urls), True
 
-    # Verwenden Sie tqdm, um eine Fortschrittsanzeige hinzuzufügen
-    for link in tqdm(service_links, desc="Scraping services"):
-        service_url = link['href']
-        logger.info(f"Crawling service URL: {service_url}")
-        service_data = extract_info(service_url)
-        if not service_data:
-            continue
+def write_catalogue_files(session, changed):
+    # Suchindex und Katalog-Snapshot neu aufbauen, wenn sich etwas geändert hat
+    version = get_catalogue_version(session)
+    if changed or not os.path.exists(settings.SEARCH_INDEX_PATH):
+        build_search_index(session, version).save(settings.SEARCH_INDEX_PATH)
+        logger.info(f"Search index written to {settings.SEARCH_INDEX_PATH}.")
+    if changed or not os.path.exists(settings.SNAPSHOT_PATH):
+        save_snapshot(build_snapshot(session, version), settings.SNAPSHOT_PATH)
+        logger.info(f"Catalogue snapshot version {version} written to {settings.SNAPSHOT_PATH}.")
 
-        if service_data['title'] is None:
-            logger.error(f"NULL title found for service URL: {service_url}")
-            continue
+def check_links(session):
+    # Optionale Stufe nach dem Crawl mit eigenem Verbindungspool und Rate-Limit
+    link_fetcher = create_link_fetcher()
+    try:
+        return check_form_links(session, link_fetcher)
+    finally:
+        link_fetcher.close()
 
-        logger.info(f"Service Title: {service_data['title']}")
-        logger.debug(f"Prerequisites: {service_data['voraussetzungen'][:100]}...")  # Nur die ersten 100 Zeichen anzeigen
-        logger.debug(f"Required Documents: {service_data['erforderliche_unterlagen'][:100]}...")  # Nur die ersten 100 Zeichen anzeigen
-        logger.debug(f"Fees: {service_data['gebuehren'][:100]}...")  # Nur die ersten 100 Zeichen anzeigen
-        logger.debug(f"Legal Basis: {service_data['rechtsgrundlagen'][:100]}...")  # Nur die ersten 100 Zeichen anzeigen
-        logger.debug(f"Forms: {service_data['formulare']}")
+def crawl_data(concurrency=None, incremental=None, batch_size=None, parse_workers=None, replay=None,
+               urls=None, failed=False, restart=False, links=None):
+    concurrency = concurrency or settings.SCRAPER_CONCURRENCY
+    if incremental is None:
+        incremental = settings.SCRAPER_INCREMENTAL
+    batch_size = batch_size or settings.SCRAPER_BATCH_SIZE
+    if parse_workers is None:
+        parse_workers = settings.SCRAPER_PARSE_WORKERS
+    if links is None:
+        links = settings.SCRAPER_CHECK_LINKS and not replay
+    if replay or urls or failed:
+        # Archiv neu parsen bzw. ausgewählte URLs gezielt neu laden, ohne Abgleich mit der Datenbank
+        incremental = False
 
+    fetcher = None
+    if replay:
+        archive = PageArchive(replay)
+    else:
+        archive = PageArchive(settings.SCRAPER_ARCHIVE_DIR) if settings.SCRAPER_ARCHIVE_DIR else None
+        fetcher = create_fetcher(concurrency)
+
+    try:
         with get_session() as session:
-            # Dienstleistung erstellen
-            service = Service(
-                title=service_data['title'],
-                voraussetzungen=service_data['voraussetzungen'],
-                erforderliche_unterlagen=service_data['erforderliche_unterlagen'],
-                gebuehren=service_data['gebuehren'],
-                rechtsgrundlagen=service_data['rechtsgrundlagen'],
-                digital_service=service_data['digital_service'],
-                zustaendiges_amt=service_data['zustaendiges_amt']
-            )
-            services.append(service)
-
-            for form_data in service_data['formulare']:
-                if form_data['title'] is None:
-                    logger.error(f"NULL title found for form URL: {form_data['url']} in service URL: {service_url}")
+            tracker = CrawlJobTracker(session, settings.SCRAPER_MAX_ATTEMPTS)
+            service_urls, full = select_service_urls(tracker, fetcher, archive, replay, urls, failed, restart)
+            if service_urls is None:
+                return
+
+            page_states = load_page_states() if incremental else {}
+            unchanged = 0
+
+            if replay:
+                results = replay_services(service_urls, archive, parse_workers)
+            else:
+                results = fetch_services(service_urls, fetcher, concurrency, page_states, parse_workers, archive)
+
+            writer = ServiceWriter(session, batch_size)
+            # Job-Status im selben Commit wie die Dienstleistungen: nach einem Abbruch bleiben
+            # nicht gespeicherte URLs offen und werden beim nächsten Start erneut geladen
+            writer.before_commit.append(tracker.write)
+
+            # Verwenden Sie tqdm, um eine Fortschrittsanzeige hinzuzufügen
+            for service_url, page in tqdm(results, total=len(service_urls), desc="Scraping services"):
+                logger.info(f"Crawled service URL: {service_url}")
+                if not page or page.get('error'):
+                    tracker.record(service_url, FAILED, page and page['error'], page and page['started_at'])
+                    scraper_pages.inc(outcome="failed")
                     continue
-                if len(form_data['url']) > MAX_URL_LENGTH:
-                    logger.error(f"URL too long for form URL: {form_data['url']} in service URL: {service_url}")
+
+                if page['unchanged']:
+                    unchanged += 1
+                    tracker.record(service_url, DONE, started_at=page['started_at'])
+                    scraper_pages.inc(outcome="unchanged")
                     continue
-                form = Form(title=form_data['title'], url=form_data['url'], service=service)
-                service.forms.append(form)
 
-            session.add_all(services)
-            session.commit()
-            logger.info("Data committed to the database.")
+                service_data = page['data']
+
+                if service_data['title'] is None:
+                    logger.error(f"NULL title found for service URL: {service_url}")
+                    tracker.record(service_url, FAILED, "no title found", page['started_at'])
+                    scraper_pages.inc(outcome="no_title")
+                    continue
+
+                logger.info(f"Service Title: {service_data['title']}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Prerequisites: {service_data['voraussetzungen'][:100]}...")  # Nur die ersten 100 Zeichen anzeigen
+                    logger.debug(f"Required Documents: {service_data['erforderliche_unterlagen'][:100]}...")  # Nur die ersten 100 Zeichen anzeigen
+                    logger.debug(f"Fees: {service_data['gebuehren'][:100]}...")  # Nur die ersten 100 Zeichen anzeigen
+                    logger.debug(f"Legal Basis: {service_data['rechtsgrundlagen'][:100]}...")  # Nur die ersten 100 Zeichen anzeigen
+                    logger.debug(f"Forms: {service_data['formulare']}")
+
+                tracker.record(service_url, DONE, started_at=page['started_at'])
+                writer.add(service_url, service_data, page)
+                scraper_pages.inc(outcome="written")
+
+            writer.flush()
+            tracker.commit()
+            logger.info(f"Crawl jobs: {tracker.counts()}")
+
+            # Nicht mehr verlinkte Dienstleistungen entfernen (mit Tombstones für /changes)
+            removed = remove_missing_services(session, service_urls) if full else 0
+            changed = writer.changes or removed
+            if links:
+                changed = check_links(session) or changed
+
+            write_catalogue_files(session, changed)
+    finally:
+        if fetcher is not None:
+            fetcher.close()
+        if archive is not None:
+            archive.close()
+
+    logger.info(f"{unchanged} unchanged services skipped.")
+    if settings.SCRAPER_METRICS_FILE:
+        write_textfile(settings.SCRAPER_METRICS_FILE)
+        logger.info(f"Crawl metrics written to {settings.SCRAPER_METRICS_FILE}.")
 
 if __name__ == "__main__":
-    crawl_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Crawl service.berlin.de into the database")
+    parser.add_argument("--replay", metavar="ARCHIVE_DIR", help="re-parse pages from a local archive instead of fetching them")
+    parser.add_argument("--url", dest="urls", action="append", metavar="URL",
+                        help="re-crawl only this service page (repeatable)")
+    parser.add_argument("--failed", action="store_true", help="re-crawl the URLs that failed in the last crawl")
+    parser.add_argument("--restart", action="store_true", help="start a full crawl instead of resuming an interrupted one")
+    parser.add_argument("--check-links", action="store_true",
+                        help="only HEAD-check stale form links (no crawl); SCRAPER_CHECK_LINKS runs it after each crawl")
+    args = parser.parse_args()
+    if args.check_links:
+        with get_session() as session:
+            write_catalogue_files(session, check_links(session))
+    else:
+        crawl_data(replay=args.replay, urls=args.urls, failed=args.failed, restart=args.restart)
\ No newline at end of file
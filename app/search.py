@@ -0,0 +1,183 @@
+from collections import Counter, defaultdict
+import json
+import math
+import os
+import re
+import threading
+from sqlmodel import select
+from app.models import Service
+
+# Invertierter Index über die Dienstleistungen mit deutscher Tokenisierung,
+# CISTEM-Stemming und BM25-Ranking. Wird am Ende jedes Crawls neu aufgebaut.
+
+SEARCH_FIELDS = ["voraussetzungen", "erforderliche_unterlagen", "gebuehren", "rechtsgrundlagen"]
+TITLE_WEIGHT = 3  # Treffer im Titel zählen dreifach
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_LENGTH = 160
+
+STOPWORDS = {
+    "aber", "als", "am", "an", "auch", "auf", "aus", "bei", "bis", "da", "das", "dass", "dem", "den",
+    "der", "des", "die", "dies", "diese", "dieser", "du", "durch", "ein", "eine", "einem", "einen",
+    "einer", "eines", "er", "es", "für", "hat", "ich", "ihr", "im", "in", "ist", "ja", "kann",
+    "mit", "nach", "nicht", "noch", "nur", "oder", "sein", "sich", "sie", "sind", "so", "um", "und",
+    "uns", "von", "vor", "war", "was", "werden", "wie", "wir", "wird", "zu", "zum", "zur",
+}
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def stem(word):
+    # CISTEM (Weissweiler & Fraser, 2017), Variante ohne Berücksichtigung der Großschreibung
+    word = word.lower()
+    word = word.replace("ü", "u").replace("ö", "o").replace("ä", "a").replace("ß", "ss")
+    word = re.sub(r"^ge(.{4,})", r"\1", word)
+    word = word.replace("sch", "$").replace("ei", "%").replace("ie", "&")
+    word = re.sub(r"(.)\1", r"\1*", word)
+    while len(word) > 3:
+        if len(word) > 5:
+            shortened = re.sub(r"e[mr]$", "", word)
+            if shortened == word:
+                shortened = re.sub(r"nd$", "", word)
+            if shortened != word:
+                word = shortened
+                continue
+        shortened = re.sub(r"t$", "", word)
+        if shortened == word:
+            shortened = re.sub(r"[esn]$", "", word)
+        if shortened == word:
+            break
+        word = shortened
+    word = re.sub(r"(.)\*", r"\1\1", word)
+    return word.replace("$", "sch").replace("%", "ei").replace("&", "ie")
+
+
+def tokenize(text):
+    # Liefert (Stamm, Wort in Kleinschreibung) für alle Wörter außer Stoppwörtern
+    for match in TOKEN_PATTERN.finditer(text or ""):
+        word = match.group().lower()
+        if word in STOPWORDS or word.isdigit() and len(word) < 2:
+            continue
+        yield stem(word), word
+
+
+class SearchIndex:
+    def __init__(self, docs, postings, forms, version=None):
+        self.docs = docs  # id -> {"title", "text", "length"}
+        self.postings = postings  # Stamm -> {id: gewichtete Termfrequenz}
+        self.forms = forms  # Stamm -> Wortformen (für Snippets)
+        self.version = version
+        self.avg_length = sum(doc["length"] for doc in docs.values()) / len(docs) if docs else 0.0
+
+    @classmethod
+    def build(cls, services, version=None):
+        docs = {}
+        postings = defaultdict(dict)
+        forms = defaultdict(set)
+        for service in services:
+            counts = Counter()
+            for stemmed, word in tokenize(service["title"]):
+                counts[stemmed] += TITLE_WEIGHT
+                forms[stemmed].add(word)
+            text = "\n".join(service[field] for field in SEARCH_FIELDS if service.get(field))
+            for stemmed, word in tokenize(text):
+                counts[stemmed] += 1
+                forms[stemmed].add(word)
+            for stemmed, count in counts.items():
+                postings[stemmed][service["id"]] = count
+            docs[service["id"]] = {"title": service["title"], "text": text, "length": sum(counts.values())}
+        return cls(docs, dict(postings), {key: sorted(value) for key, value in forms.items()}, version)
+
+    def search(self, query, limit=10):
+        terms = list(dict.fromkeys(stemmed for stemmed, _ in tokenize(query)))
+        scores = defaultdict(float)
+        total = len(self.docs)
+        for term in terms:
+            matches = self.postings.get(term)
+            if not matches:
+                continue
+            idf = math.log(1 + (total - len(matches) + 0.5) / (len(matches) + 0.5))
+            for doc_id, frequency in matches.items():
+                norm = 1 - BM25_B + BM25_B * self.docs[doc_id]["length"] / self.avg_length
+                scores[doc_id] += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        words = [word for term in terms for word in self.forms.get(term, [])]
+        pattern = re.compile(r"\b(%s)\b" % "|".join(map(re.escape, words)), re.IGNORECASE) if words else None
+        return [
+            {
+                "id": doc_id,
+                "title": self.docs[doc_id]["title"],
+                "score": round(score, 4),
+                "snippet": self.snippet(self.docs[doc_id]["text"], pattern),
+            }
+            for doc_id, score in ranked
+        ]
+
+    @staticmethod
+    def snippet(text, pattern):
+        match = pattern.search(text) if pattern else None
+        start = max(0, match.start() - SNIPPET_LENGTH // 3) if match else 0
+        end = start + SNIPPET_LENGTH
+        # An Wortgrenzen ausrichten
+        if start > 0:
+            start = max(text.rfind(" ", 0, start) + 1, text.rfind("\n", 0, start) + 1)
+        if end < len(text):
+            end = max(text.rfind(" ", start, end), text.rfind("\n", start, end), start + SNIPPET_LENGTH // 2)
+        snippet = " ".join(text[start:end].split())
+        prefix = "…" if start > 0 else ""
+        suffix = "…" if end < len(text) else ""
+        return prefix + snippet + suffix
+
+    def save(self, path):
+        # Atomar ersetzen, damit die API nie eine halb geschriebene Datei liest
+        data = {
+            "version": self.version,
+            "docs": {str(doc_id): doc for doc_id, doc in self.docs.items()},
+            "postings": {term: {str(doc_id): count for doc_id, count in matches.items()} for term, matches in self.postings.items()},
+            "forms": self.forms,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        docs = {int(doc_id): doc for doc_id, doc in data["docs"].items()}
+        postings = {term: {int(doc_id): count for doc_id, count in matches.items()} for term, matches in data["postings"].items()}
+        return cls(docs, postings, data["forms"], data.get("version"))
+
+
+def build_search_index(session, version=None):
+    columns = [Service.id, Service.title] + [getattr(Service, field) for field in SEARCH_FIELDS]
+    rows = session.exec(select(*columns)).all()
+    return SearchIndex.build((dict(row._mapping) for row in rows), version)
+
+
+class SearchIndexStore:
+    # Hält den geladenen Index und lädt ihn neu, sobald der Scraper eine neue Datei geschrieben hat
+    def __init__(self, path, session_factory):
+        self.path = path
+        self.session_factory = session_factory
+        self._index = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if self._index is None or mtime != self._mtime:
+                if mtime is not None:
+                    self._index = SearchIndex.load(self.path)
+                else:
+                    # Noch kein Index vom Scraper: aus der Datenbank aufbauen
+                    with self.session_factory() as session:
+                        self._index = build_search_index(session)
+                self._mtime = mtime
+            return self._index
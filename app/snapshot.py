@@ -0,0 +1,211 @@
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timezone
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlmodel import select
+from app.compression import format_datetime
+from app.models import CHANGE_FORM_FIELDS, CHANGE_SERVICE_FIELDS, SERVICE_FIELDS, Form, Office, Service, ServiceOfficeLink, Tombstone
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import msgpack
+except ImportError:  # optional; ohne msgpack wird der Snapshot als JSON geschrieben
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Schreibgeschützter Katalog-Snapshot: alle Dienstleistungen, Formulare und Behörden in einer Datei,
+# die der Scraper am Ende jedes Crawls schreibt und die API im Snapshot-Modus komplett im Speicher hält.
+# Gespeichert werden nur die öffentlichen Felder und was /changes braucht, keine internen Crawl-Spalten.
+
+VERSION_FIELDS = ["created_version", "crawl_version"]
+
+
+def select_records(session, model, fields):
+    table = model.__table__
+    rows = session.execute(select(*(table.c[name] for name in fields)).order_by(table.c.id))
+    return [jsonable_encoder(dict(row._mapping), custom_encoder={datetime: format_datetime}) for row in rows]
+
+
+def build_snapshot(session, version):
+    services = select_records(session, Service, CHANGE_SERVICE_FIELDS + VERSION_FIELDS)
+    forms = select_records(session, Form, CHANGE_FORM_FIELDS + VERSION_FIELDS)
+    office_services = defaultdict(list)
+    for office_id, service_id in session.exec(
+        select(ServiceOfficeLink.office_id, ServiceOfficeLink.service_id).order_by(ServiceOfficeLink.service_id)
+    ):
+        office_services[office_id].append(service_id)
+    offices = [
+        {"id": office_id, "name": name, "services": office_services[office_id]}
+        for office_id, name in session.exec(select(Office.id, Office.name).order_by(Office.name))
+        if office_services[office_id]
+    ]
+    tombstones = [
+        {"entity": entity, "entity_id": entity_id, "crawl_version": crawl_version}
+        for entity, entity_id, crawl_version in session.exec(
+            select(Tombstone.entity, Tombstone.entity_id, Tombstone.crawl_version).order_by(Tombstone.id)
+        )
+    ]
+    return {
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "services": services,
+        "forms": forms,
+        "offices": offices,
+        "tombstones": tombstones,
+    }
+
+
+def save_snapshot(data, path):
+    # Atomar ersetzen: die API sieht immer entweder den alten oder den vollständigen neuen Snapshot
+    if msgpack is not None:
+        content = msgpack.packb(data, use_bin_type=True)
+    else:
+        content = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    with open(path, "rb") as f:
+        content = f.read()
+    # JSON beginnt mit "{", eine msgpack-Map nie
+    if content[:1] == b"{":
+        return CatalogueSnapshot(json.loads(content))
+    if msgpack is None:
+        raise RuntimeError(f"{path} is a msgpack snapshot, but msgpack is not installed")
+    return CatalogueSnapshot(msgpack.unpackb(content, raw=False))
+
+
+class CatalogueSnapshot:
+    def __init__(self, data):
+        self.version = data["version"]
+        self.created_at = data["created_at"]
+        self.services = data["services"]  # nach id sortiert
+        self.forms = data["forms"]  # nach id sortiert
+        self.offices = data["offices"]  # nach Name sortiert
+        self.tombstones = data.get("tombstones", [])  # fehlt in Snapshots älterer Versionen
+
+        # Indizes für die Lese-Endpunkte
+        self.service_ids = [service["id"] for service in self.services]
+        self.services_by_id = {service["id"]: service for service in self.services}
+        self.services_by_digital = {
+            value: [service for service in self.services if service["digital_service"] == value]
+            for value in (True, False)
+        }
+        self.services_by_office = {
+            office["name"]: [self.services_by_id[service_id] for service_id in office["services"]]
+            for office in self.offices
+        }
+        self.form_ids = [form["id"] for form in self.forms]
+        self.forms_by_service = defaultdict(list)
+        for form in self.forms:
+            self.forms_by_service[form["service_id"]].append(
+                {"id": form["id"], "title": form["title"], "url": form["url"]}
+            )
+
+    def select_services(self, digital_service=None, office=None, after=None, limit=None, skip=0):
+        # Gleiche Semantik wie die SQL-Abfragen: nach id sortiert, Keyset über after
+        if office is not None:
+            candidates = self.services_by_office.get(office, [])
+        elif digital_service is not None:
+            candidates = self.services_by_digital[digital_service]
+            digital_service = None
+        else:
+            candidates = self.services
+        start = bisect_right(candidates, after, key=lambda service: service["id"]) if after is not None else skip
+
+        result = []
+        for service in candidates[start:]:
+            if digital_service is not None and service["digital_service"] != digital_service:
+                continue
+            result.append(service)
+            if limit is not None and len(result) == limit:
+                break
+        return result
+
+    def select_forms(self, after=None, limit=None):
+        start = bisect_right(self.form_ids, after) if after is not None else 0
+        end = start + limit if limit is not None else None
+        return [{"id": form["id"], "title": form["title"], "url": form["url"]} for form in self.forms[start:end]]
+
+    def office_counts(self, digital_service=None):
+        counts = []
+        for office in self.offices:
+            services = self.services_by_office[office["name"]]
+            if digital_service is not None:
+                services = [service for service in services if service["digital_service"] == digital_service]
+            if services:
+                counts.append({"id": office["id"], "name": office["name"], "services": len(services)})
+        return counts
+
+    def changes(self, since):
+        # Wie die Abfragen für /changes: alles mit einer crawl_version nach since
+        services = [service for service in self.services if service.get("crawl_version", 0) > since]
+        forms = [form for form in self.forms if form.get("crawl_version", 0) > since]
+        tombstones = [
+            (tombstone["entity"], tombstone["entity_id"])
+            for tombstone in self.tombstones if tombstone["crawl_version"] > since
+        ]
+        return services, forms, tombstones
+
+    def shape_service(self, service, fields=None, include_forms=False):
+        item = {name: service[name] for name in fields or SERVICE_FIELDS}
+        if include_forms:
+            item["forms"] = self.forms_by_service.get(service["id"], [])
+        return item
+
+
+class SnapshotStore:
+    # Hält den geladenen Snapshot und tauscht ihn aus, sobald der Scraper eine neue Datei geschrieben hat.
+    # Der neue Snapshot wird vollständig aufgebaut, bevor die Referenz ersetzt wird.
+    def __init__(self, path, check_interval: float = 5):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._reload = None
+
+    async def current(self):
+        # Für async-Handler: Dateiprüfung und Laden laufen im Threadpool, nie in der Event-Loop. Solange
+        # ein neuer Snapshot im Hintergrund aufgebaut wird, bedienen die Anfragen weiter den bisherigen.
+        if self._snapshot is None:
+            return await run_in_threadpool(self.get)
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval and (self._reload is None or self._reload.done()):
+            self._checked_at = now
+            self._reload = asyncio.create_task(self._refresh())
+        return self._snapshot
+
+    async def _refresh(self):
+        try:
+            await run_in_threadpool(self.get)
+        except Exception as e:
+            # Defekte oder halb kopierte Datei: beim bisherigen Snapshot bleiben
+            logger.error(f"Reloading catalogue snapshot {self.path} failed: {e}")
+
+    def get(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            if self._snapshot is None:
+                raise
+            return self._snapshot
+        if self._snapshot is not None and mtime == self._mtime:
+            return self._snapshot
+        with self._lock:
+            if self._snapshot is None or mtime != self._mtime:
+                snapshot = load_snapshot(self.path)
+                self._snapshot, self._mtime = snapshot, mtime
+                logger.info(f"Loaded catalogue snapshot version {snapshot.version} from {self.path}.")
+            return self._snapshot
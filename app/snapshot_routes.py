@@ -0,0 +1,129 @@
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from app.routes import (
+    STREAM_BATCH_SIZE, cached_response, change_feed, next_cursor_headers, parse_fields, parse_include, streaming_response,
+)
+from app.snapshot import SnapshotStore
+from config import config
+from typing import Optional, List
+import os
+
+# Lese-Endpunkte im Snapshot-Modus (API_MODE=snapshot): gleiche Pfade, Parameter und Antworten wie
+# app/routes.py, aber ohne Datenbankzugriff. main.py bindet diesen Router vor dem Datenbank-Router ein.
+
+router = APIRouter()
+
+settings = config[os.getenv("ENV", "development")]
+
+# Neue Snapshot-Dateien werden im selben Intervall erkannt wie neue Katalogversionen im Datenbank-Modus
+snapshot_store = SnapshotStore(settings.SNAPSHOT_PATH, settings.CACHE_VERSION_CHECK_INTERVAL)
+
+async def current_snapshot():
+    try:
+        return await snapshot_store.current()
+    except FileNotFoundError:
+        raise HTTPException(status_code=503, detail="Catalogue snapshot not available")
+
+async def iter_batches(items):
+    for start in range(0, len(items), STREAM_BATCH_SIZE):
+        yield items[start:start + STREAM_BATCH_SIZE]
+
+@router.get("/services/")
+async def read_services(
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    after: Optional[int] = None,
+    include: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    fields, include_forms = parse_fields(fields), parse_include(include)
+    snapshot = await current_snapshot()
+    services = [
+        snapshot.shape_service(service, fields, include_forms)
+        for service in snapshot.select_services(after=after, limit=limit, skip=skip)
+    ]
+    response.headers.update(next_cursor_headers(services, limit))
+    return services
+
+@router.get("/ALL-SERVICES")
+async def get_all_services(
+    request: Request,
+    digital_service: Optional[bool] = Query(None, alias="DIGITAL-SERVICE"),
+    responsible_office: Optional[str] = Query(None, alias="RESPONSIBLE-OFFICE"),
+    after: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    stream: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    include: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    fields, include_forms = parse_fields(fields), parse_include(include)
+    snapshot = await current_snapshot()
+
+    def select():
+        services = snapshot.select_services(digital_service, responsible_office or None, after, limit)
+        return [snapshot.shape_service(service, fields, include_forms) for service in services]
+
+    if stream:
+        return streaming_response(iter_batches(select()), stream)
+
+    async def build():
+        services = select()
+        return services, next_cursor_headers(services, limit)
+
+    return await cached_response(request, build, snapshot.version, precompute=True)
+
+@router.get("/SERVICE/{service_id}")
+async def get_service(
+    request: Request,
+    service_id: int,
+    include: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    fields, include_forms = parse_fields(fields), parse_include(include)
+    snapshot = await current_snapshot()
+
+    async def build():
+        service = snapshot.services_by_id.get(service_id)
+        if service is None:
+            raise HTTPException(status_code=404, detail="Service not found")
+        return snapshot.shape_service(service, fields, include_forms), {}
+
+    return await cached_response(request, build, snapshot.version)
+
+@router.get("/ALL-FORMS", response_model=List[dict])
+async def get_all_forms(
+    request: Request,
+    after: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    stream: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+):
+    snapshot = await current_snapshot()
+    if stream:
+        return streaming_response(iter_batches(snapshot.select_forms(after, limit)), stream)
+
+    async def build():
+        forms = snapshot.select_forms(after, limit)
+        return forms, next_cursor_headers(forms, limit)
+
+    return await cached_response(request, build, snapshot.version, precompute=True)
+
+@router.get("/OFFICES", response_model=List[dict])
+async def get_offices(
+    request: Request,
+    digital_service: Optional[bool] = Query(None, alias="DIGITAL-SERVICE"),
+):
+    snapshot = await current_snapshot()
+
+    async def build():
+        return snapshot.office_counts(digital_service), {}
+
+    return await cached_response(request, build, snapshot.version, precompute=True)
+
+@router.get("/changes")
+async def get_changes(request: Request, since: int = Query(..., ge=0)):
+    snapshot = await current_snapshot()
+
+    async def build():
+        return change_feed(since, snapshot.version, *snapshot.changes(since)), {}
+
+    return await cached_response(request, build, snapshot.version)
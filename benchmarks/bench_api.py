@@ -0,0 +1,98 @@
+import argparse
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import requests
+from fastapi import APIRouter, Depends, FastAPI
+from sqlalchemy.orm import Session
+from sqlmodel import select
+
+# Lastvergleich der asynchronen Routen mit dem bisherigen Muster (async-Handler mit blockierender
+# ORM-Abfrage) gegen den vorhandenen Katalog in DATABASE_URL; die Datenbank wird nur gelesen:
+#   python -m benchmarks.bench_api --requests 2000 --concurrency 32
+# Startet uvicorn als eigenen Prozess, damit Server und Lastgenerator sich nicht den GIL teilen.
+
+
+def create_app():
+    from app.db import get_db
+    from app.models import Service
+    from app.routes import apply_keyset, router
+
+    legacy = APIRouter()
+
+    @legacy.get("/legacy/services/")
+    async def legacy_services(limit: int = 10, after: Optional[int] = None, db: Session = Depends(get_db)):
+        # Bisheriger Stand: die Abfrage läuft synchron in der Event-Loop
+        return db.exec(apply_keyset(select(Service), Service, after, limit)).all()
+
+    app = FastAPI()
+    app.include_router(router)
+    app.include_router(legacy)
+    return app
+
+
+def wait_until_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/services/?limit=1", timeout=1).ok:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"server at {base_url} did not start")
+
+
+def run_load(base_url, path, ids, total, concurrency, limit):
+    local = threading.local()
+
+    def request(_):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        params = {"limit": limit, "after": random.choice(ids)}
+        start = time.perf_counter()
+        response = local.session.get(f"{base_url}{path}", params=params, timeout=30)
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(request, range(total)))
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark for the async API routes")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=20, help="services per request")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "benchmarks.bench_api:create_app", "--factory",
+        "--port", str(args.port), "--log-level", "warning",
+    ])
+    try:
+        wait_until_ready(base_url)
+        ids = [0] + [service["id"] for service in requests.get(f"{base_url}/ALL-SERVICES?fields=id").json()]
+        print(f"services: {len(ids) - 1}, requests: {args.requests}, concurrency: {args.concurrency}")
+        for label, path in [("blocking (legacy)", "/legacy/services/"), ("async", "/services/")]:
+            elapsed, latencies = run_load(base_url, path, ids, args.requests, args.concurrency, args.limit)
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{label:<18} {args.requests / elapsed:8.1f} req/s  "
+                  f"p50 {statistics.median(latencies) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
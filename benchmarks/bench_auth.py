@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import auth
+from app.models import User
+
+# Latenz authentifizierter Anfragen (Token prüfen + Benutzer laden) mit und ohne Benutzer-Cache
+# sowie Anmeldungen/s und Blockierung der Event-Loop bei bcrypt in der Loop bzw. im eigenen Pool:
+#   python -m benchmarks.bench_auth --requests 2000 --logins 20
+
+
+async def measure_requests(session_factory, token, count, cached):
+    latencies = []
+    for _ in range(count):
+        if not cached:
+            auth.user_cache.clear()
+        start = time.perf_counter()
+        async with session_factory() as session:
+            user = await auth.get_current_active_user(await auth.get_current_user(token, session))
+        latencies.append(time.perf_counter() - start)
+        assert user.username == "bench"
+    return sorted(latencies)
+
+
+async def login_inline(session_factory, username, password):
+    # Bisheriges Verhalten: bcrypt direkt in der Event-Loop
+    async with session_factory() as session:
+        user = await auth.get_user(session, username)
+        return user if auth.verify_password(password, user.hashed_password) else False
+
+
+async def login_pool(session_factory, username, password):
+    async with session_factory() as session:
+        return await auth.authenticate_user(session, username, password)
+
+
+async def measure_logins(session_factory, login, count):
+    # Ein Ticker misst, wie lange die Event-Loop zwischendurch nicht reagiert
+    stalls = []
+    running = True
+
+    async def ticker():
+        while running:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append(time.perf_counter() - start)
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    results = await asyncio.gather(*[login(session_factory, "bench", "secret") for _ in range(count)])
+    elapsed = time.perf_counter() - start
+    running = False
+    await tick
+    assert all(results)
+    return elapsed, max(stalls)
+
+
+def describe(label, latencies):
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<24} mean {statistics.mean(latencies) * 1e6:8.0f} µs  p95 {p95 * 1e6:8.0f} µs")
+
+
+async def run(database_url, requests, logins):
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        session.add(User(username="bench", email="bench@example.org", hashed_password=auth.get_password_hash("secret")))
+        await session.commit()
+    token = auth.create_access_token({"sub": "bench"})
+
+    describe("request, no user cache", await measure_requests(session_factory, token, requests, cached=False))
+    describe("request, user cache", await measure_requests(session_factory, token, requests, cached=True))
+    for label, login in [("login, bcrypt in loop", login_inline), ("login, bcrypt pool", login_pool)]:
+        elapsed, stall = await measure_logins(session_factory, login, logins)
+        print(f"{label:<24} {logins / elapsed:8.1f} logins/s  max loop stall {stall * 1000:8.1f} ms")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Authentication latency benchmark")
+    parser.add_argument("--requests", type=int, default=1000, help="authenticated requests per variant")
+    parser.add_argument("--logins", type=int, default=20, help="concurrent logins per variant")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", args.requests, args.logins))
+
+
+if __name__ == "__main__":
+    main()
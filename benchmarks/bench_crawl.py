@@ -0,0 +1,55 @@
+import argparse
+import os
+import time
+
+from app.scraper import create_fetcher, fetch_services
+from app.parser import extract_service_links
+from benchmarks.fixtures import FixtureServer, load_saved_pages
+
+# Vergleicht den sequentiellen mit dem parallelen Crawl gegen einen lokalen Stub-Server:
+#   SCRAPER_RATE_LIMIT=0 python -m benchmarks.bench_crawl --count 300 --latency 0.05 --concurrency 16
+# Ohne SCRAPER_RATE_LIMIT=0 begrenzt das Rate-Limit pro Host den parallelen Durchsatz.
+
+
+def run_crawl(server, concurrency, parse_workers=0):
+    fetcher = create_fetcher(concurrency)
+    try:
+        service_urls = extract_service_links(fetcher.get(server.index_url).text)
+        start = time.perf_counter()
+        pages = fetch_services(service_urls, fetcher, concurrency, parse_workers=parse_workers)
+        results = [(url, page['data']) for url, page in pages]
+        elapsed = time.perf_counter() - start
+    finally:
+        fetcher.close()
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl benchmark against a local stub server")
+    parser.add_argument("--count", type=int, default=200, help="number of synthetic service pages")
+    parser.add_argument("--pages", help="directory with saved service pages (*.html)")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated server latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1,
+                        help="processes for the separate parse stage")
+    args = parser.parse_args()
+
+    pages = load_saved_pages(args.pages) if args.pages else None
+    with FixtureServer(pages=pages, count=args.count, latency=args.latency) as server:
+        sequential, sequential_time = run_crawl(server, 1)
+        concurrent, concurrent_time = run_crawl(server, args.concurrency)
+        pipelined, pipelined_time = run_crawl(server, args.concurrency, args.parse_workers)
+
+    pages_count = len(sequential)
+    print(f"pages: {pages_count}, latency: {args.latency * 1000:.0f} ms")
+    print(f"sequential:            {sequential_time:8.2f} s  {pages_count / sequential_time:8.1f} pages/s")
+    print(f"concurrent (n={args.concurrency:<3}):   {concurrent_time:8.2f} s  {pages_count / concurrent_time:8.1f} pages/s")
+    print(f"+ parse processes (n={args.parse_workers:<3}): {pipelined_time:8.2f} s  {pages_count / pipelined_time:8.1f} pages/s")
+    print(f"speedup: {sequential_time / concurrent_time:.1f}x (threads), {sequential_time / pipelined_time:.1f}x (threads + processes)")
+    if sequential != concurrent or sequential != pipelined:
+        raise SystemExit("concurrent crawl produced different extract_info() results")
+    print("results identical: yes")
+
+
+if __name__ == "__main__":
+    main()
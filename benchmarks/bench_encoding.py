@@ -0,0 +1,61 @@
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from app.compression import available_encodings, compress, dumps
+from app.parser import parse_service_page
+from benchmarks.fixtures import generate_service_page
+
+# Serialisierung und Kompression einer /ALL-SERVICES-Antwort (synthetische Dienstleistungen):
+#   python -m benchmarks.bench_encoding --count 1000
+
+
+def encode_legacy(content):
+    # Bisheriger Weg in cached_response()
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialization and compression benchmark for catalogue responses")
+    parser.add_argument("--count", type=int, default=1000, help="number of synthetic services")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    services = []
+    for n in range(args.count):
+        service = parse_service_page(generate_service_page(n), f"page-{n}")
+        service.pop("formulare")
+        service.pop("zustaendige_aemter")
+        services.append({"id": n + 1, **service})
+
+    legacy_time, legacy_body = best_time(lambda: encode_legacy(services), args.repeat)
+    fast_time, body = best_time(lambda: dumps(services), args.repeat)
+    if json.loads(legacy_body) != json.loads(body):
+        raise SystemExit("serialized bodies differ")
+    print(f"{'jsonable_encoder + json':<26} {legacy_time * 1000:8.1f} ms  {len(legacy_body) / 1024:9.1f} KiB")
+    print(f"{'dumps()':<26} {fast_time * 1000:8.1f} ms  {len(body) / 1024:9.1f} KiB")
+
+    for encoding in available_encodings():
+        for static in (False, True):
+            elapsed, compressed = best_time(lambda: compress(body, encoding, static), args.repeat)
+            label = f"{encoding} ({'precomputed' if static else 'per request'})"
+            print(f"{label:<26} {elapsed * 1000:8.1f} ms  {len(compressed) / 1024:9.1f} KiB  "
+                  f"{len(body) / len(compressed):5.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.fixtures import FixtureServer, generate_form_document
+
+# Prüfung der Formular-Links gegen den lokalen Fixture-Server, sequentiell und parallel:
+#   python -m benchmarks.bench_links --count 300 --latency 0.02 --concurrency 16
+# Danach wird geprüft, dass Status und Größe jedes Formulars dem ausgelieferten Dokument entsprechen
+# und dass ein zweiter Lauf ohne veraltete Links keine Anfrage stellt.
+
+
+def configure_environment(tmp):
+    # config liest die Umgebung beim Import, deshalb vor dem ersten Import aus app setzen
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ["SEARCH_INDEX_PATH"] = os.path.join(tmp, "search_index.json")
+    os.environ["SNAPSHOT_PATH"] = os.path.join(tmp, "catalogue.snapshot")
+    os.environ["SCRAPER_ARCHIVE_DIR"] = ""
+    os.environ["SCRAPER_METRICS_FILE"] = ""
+    os.environ["SCRAPER_CHECK_LINKS"] = "False"
+    os.environ.setdefault("SCRAPER_RATE_LIMIT", "0")
+    os.environ.setdefault("LINK_CHECK_RATE_LIMIT", "0")
+
+
+def link_checks():
+    from app.metrics import scraper_link_checks
+
+    return sum(scraper_link_checks.value(outcome=outcome) for outcome in ("ok", "broken", "error"))
+
+
+def run_check(concurrency, max_age):
+    from app.db import get_session
+    from app.links import check_form_links, create_link_fetcher
+
+    fetcher = create_link_fetcher(concurrency)
+    try:
+        with get_session() as session:
+            start = time.perf_counter()
+            changed = check_form_links(session, fetcher, max_age=max_age, concurrency=concurrency)
+            return changed, time.perf_counter() - start
+    finally:
+        fetcher.close()
+
+
+def verify_forms():
+    from sqlmodel import select
+
+    from app.db import get_session
+    from app.models import Form
+
+    errors = []
+    with get_session() as session:
+        forms = session.exec(select(Form.url, Form.link_status, Form.link_size, Form.link_checked_at)).all()
+    for url, status, size, checked_at in forms:
+        document = generate_form_document(urlsplit(url).path.rsplit("/", 1)[-1])
+        # Bei 404 ist die Größe die der Fehlerseite und wird nicht verglichen
+        expected = (404, size) if document is None else (200, len(document))
+        if checked_at is None or (status, size) != expected:
+            errors.append(f"{url}: {status}/{size}, expected {expected[0]}/{expected[1]}")
+    return len(forms), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Form link check benchmark against a local stub server")
+    parser.add_argument("--count", type=int, default=300, help="number of synthetic service pages")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated server latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(tmp)
+
+        from sqlmodel import SQLModel
+
+        import app.scraper as scraper
+        from app.db import get_engine, init_db
+
+        SQLModel.metadata.drop_all(get_engine())
+        init_db()
+
+        with FixtureServer(count=args.count, latency=args.latency) as server:
+            scraper.BASE_URL = server.index_url
+            scraper.crawl_data(concurrency=args.concurrency, incremental=False, restart=True, links=False)
+
+            # max_age=0: alle Links gelten als veraltet, jeder Lauf prüft den vollständigen Bestand
+            for label, concurrency in (("sequential", 1), ("concurrent", args.concurrency)):
+                checks_before = link_checks()
+                changed, elapsed = run_check(concurrency, max_age=0)
+                links = link_checks() - checks_before
+                print(f"{label:>10}: {links} links in {elapsed:.2f}s ({links / elapsed:.1f} links/s), "
+                      f"{changed} forms changed")
+
+            checks_before = link_checks()
+            _, elapsed = run_check(args.concurrency, max_age=3600)
+            fresh_checks = link_checks() - checks_before
+            print(f"{'fresh':>10}: {fresh_checks} links in {elapsed:.2f}s")
+
+        form_count, errors = verify_forms()
+
+    print(f"forms checked: {form_count}, mismatches: {len(errors)}")
+    for error in errors[:20]:
+        print(f"  {error}")
+    sys.exit(1 if errors or fresh_checks else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import time
+
+from bs4 import BeautifulSoup
+
+from app.parser import parse_service_page, resolve_parser
+from benchmarks.fixtures import generate_service_page, load_archive_pages, load_saved_pages
+from benchmarks.golden import GOLDEN_PAGES, compare_golden, load_golden, normalize
+
+# Parsing-Mikrobenchmark (Seiten/s) über einen Korpus gespeicherter oder synthetischer Seiten:
+#   python -m benchmarks.bench_parse --count 300
+#   python -m benchmarks.bench_parse --pages saved_pages/ --parser lxml
+#   python -m benchmarks.bench_parse --archive archive/
+
+
+def parse_service_page_legacy(html, url):
+    # Bisherige Implementierung mit fünf soup.find()-Aufrufen und zwei CSS-Selektoren
+    soup = BeautifulSoup(html, 'html.parser')
+
+    title_element = soup.find('h1')
+    title = title_element.text.strip() if title_element else None
+
+    def extract_section_content(header):
+        content = []
+        section = header.find_next_sibling()
+        while section and section.name != 'h2':
+            content.append(section.get_text(separator="\n").strip())
+            section = section.find_next_sibling()
+        return "\n".join(content)
+
+    voraussetzungen = extract_section_content(soup.find('h2', string='Voraussetzungen'))
+    erforderliche_unterlagen = extract_section_content(soup.find('h2', string='Erforderliche Unterlagen'))
+    gebuehren = extract_section_content(soup.find('h2', string='Gebühren')) or "Keine Gebühren gefunden"
+    rechtsgrundlagen = extract_section_content(soup.find('h2', string='Rechtsgrundlagen'))
+
+    formular_header = soup.find('h2', string='Formulare')
+    formulare = []
+    if formular_header:
+        formular_list = formular_header.find_next_sibling('ul')
+        if formular_list:
+            formulare = [{'title': link.text.strip(), 'url': link['href']} for link in formular_list.find_all('a')]
+
+    responsible_offices = [label.get_text(strip=True) for label in soup.select('label.form-check-label strong')]
+    digital_service = bool(soup.select_one('a.list-item-style[title="Jetzt online erledigen"]'))
+
+    return {
+        "title": title,
+        "voraussetzungen": voraussetzungen,
+        "erforderliche_unterlagen": erforderliche_unterlagen,
+        "gebuehren": gebuehren,
+        "rechtsgrundlagen": rechtsgrundlagen,
+        "formulare": formulare,
+        "digital_service": digital_service,
+        "zustaendiges_amt": ", ".join(responsible_offices),
+    }
+
+
+def measure(label, parse, corpus, repeat):
+    best = None
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [parse(html, f"page-{n}") for n, html in enumerate(corpus)]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<28} {len(corpus) / best:8.1f} pages/s  {best / len(corpus) * 1000:7.2f} ms/page")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parsing microbenchmark for extract_info()")
+    parser.add_argument("--count", type=int, default=200, help="number of synthetic service pages")
+    parser.add_argument("--pages", help="directory with saved service pages (*.html)")
+    parser.add_argument("--archive", help="page archive directory written with SCRAPER_ARCHIVE_DIR")
+    parser.add_argument("--parser", default="html.parser", help="BeautifulSoup backend for the new extractor")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.archive:
+        corpus = load_archive_pages(args.archive)
+    elif args.pages:
+        corpus = load_saved_pages(args.pages)
+    else:
+        corpus = [generate_service_page(n) for n in range(args.count)]
+    backend = resolve_parser(args.parser)
+
+    before = measure("before (repeated find)", parse_service_page_legacy, corpus, args.repeat)
+    after = measure(f"after (single pass, {backend})",
+                    lambda html, url: parse_service_page(html, url, parser=backend), corpus, args.repeat)
+    # Neue Felder (z. B. zustaendige_aemter) zählen nicht als Abweichung
+    mismatches = sum(1 for old, new in zip(before, after) if any(old[key] != new[key] for key in old))
+    print(f"pages with different results: {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+    if not (args.archive or args.pages):
+        # Synthetische Seiten zusätzlich gegen die festgeschriebenen Felder prüfen
+        records = {n: normalize(data, "http://127.0.0.1") for n, data in enumerate(after[:GOLDEN_PAGES])}
+        golden_mismatches = compare_golden(records, load_golden())
+        print(f"golden check: {len(records)} pages, {len(golden_mismatches)} field mismatches")
+        if golden_mismatches:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import os
+import tempfile
+import time
+
+from sqlmodel import Session, SQLModel, create_engine, func, select
+
+from app.models import Form, Service
+from app.parser import parse_service_page
+from app.persistence import ServiceWriter
+from benchmarks.fixtures import generate_service_page
+
+# Schreibdurchsatz (Zeilen/s) der Persistenzstufe gegen SQLite oder eine lokale MySQL:
+#   python -m benchmarks.bench_persist --count 2000 --batch-size 200
+#   python -m benchmarks.bench_persist --database-url mysql+mysqlconnector://user:pw@127.0.0.1/bench
+
+
+def build_records(count):
+    records = []
+    for n in range(count):
+        service_url = f"http://127.0.0.1/dienstleistung/{n}/"
+        records.append((service_url, parse_service_page(generate_service_page(n), service_url)))
+    return records
+
+
+def write_legacy(engine, records):
+    # Bisheriges Verfahren: eine Session pro Seite, add_all() auf der wachsenden Liste
+    services = []
+    for service_url, service_data in records:
+        with Session(engine) as session:
+            service = Service(
+                source_url=service_url,
+                title=service_data['title'],
+                voraussetzungen=service_data['voraussetzungen'],
+                erforderliche_unterlagen=service_data['erforderliche_unterlagen'],
+                gebuehren=service_data['gebuehren'],
+                rechtsgrundlagen=service_data['rechtsgrundlagen'],
+                digital_service=service_data['digital_service'],
+                zustaendiges_amt=service_data['zustaendiges_amt'],
+            )
+            services.append(service)
+            for form_data in service_data['formulare']:
+                service.forms.append(Form(title=form_data['title'], url=form_data['url']))
+            session.add_all(services)
+            session.commit()
+
+
+def write_batched(engine, records, batch_size):
+    with Session(engine) as session:
+        writer = ServiceWriter(session, batch_size)
+        for service_url, service_data in records:
+            writer.add(service_url, service_data)
+        writer.flush()
+
+
+def count_rows(engine):
+    with Session(engine) as session:
+        services = session.exec(select(func.count()).select_from(Service)).one()
+        forms = session.exec(select(func.count()).select_from(Form)).one()
+    return services + forms
+
+
+def measure(database_url, label, write, records):
+    engine = create_engine(database_url)
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    start = time.perf_counter()
+    write(engine, records)
+    elapsed = time.perf_counter() - start
+    rows = count_rows(engine)
+    engine.dispose()
+    print(f"{label:<22} {rows:7d} rows  {elapsed:8.2f} s  {rows / elapsed:10.1f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistence benchmark for Service/Form rows")
+    parser.add_argument("--count", type=int, default=1000, help="number of services")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--skip-legacy", action="store_true", help="skip the quadratic per-page commit loop")
+    args = parser.parse_args()
+
+    records = build_records(args.count)
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        if not args.skip_legacy:
+            measure(database_url, "per-page commit", write_legacy, records)
+        measure(database_url, f"batched (n={args.batch_size})",
+                lambda engine, records: write_batched(engine, records, args.batch_size), records)
+        # Zweiter Lauf auf derselben Datenbank: alle Zeilen werden per Upsert aktualisiert
+        engine = create_engine(database_url)
+        start = time.perf_counter()
+        write_batched(engine, records, args.batch_size)
+        elapsed = time.perf_counter() - start
+        rows = count_rows(engine)
+        engine.dispose()
+        print(f"{'batched re-upsert':<22} {rows:7d} rows  {elapsed:8.2f} s  {rows / elapsed:10.1f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import to_async_url
+from app.models import Service
+from app.parser import parse_service_page
+from app.persistence import ServiceWriter
+from app.routes import parse_fields, serialize_form, serialize_services, service_statement
+from benchmarks.fixtures import generate_service_page
+
+# Anzahl der SQL-Abfragen und Laufzeit für Dienstleistungen mit Formularen:
+#   python -m benchmarks.bench_queries --count 500
+# Bricht ab, wenn include=forms nicht mit einer konstanten Zahl von Abfragen auskommt.
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def attach(self, engine):
+        event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def reset(self):
+        self.statements.clear()
+
+
+def populate(engine, count):
+    with Session(engine) as session:
+        writer = ServiceWriter(session, 200)
+        for n in range(count):
+            service_url = f"http://127.0.0.1/dienstleistung/{n}/"
+            writer.add(service_url, parse_service_page(generate_service_page(n), service_url))
+        writer.flush()
+
+
+def load_lazy(engine, async_engine, fields):
+    # Bisheriges Muster: Dienstleistungen laden und die Formulare einzeln nachladen
+    with Session(engine) as session:
+        services = session.exec(select(Service).order_by(Service.id)).all()
+        return [{"id": service.id, "forms": [serialize_form(form) for form in service.forms]} for service in services]
+
+
+async def load_prepared(engine, async_engine, fields):
+    # Wie die Routen: asynchrone Session, include=forms und optional fields=
+    async with AsyncSession(async_engine) as session:
+        statement = service_statement(fields).order_by(Service.id)
+        return await serialize_services(session, (await session.exec(statement)).all(), fields, True)
+
+
+async def measure(engines, counter, label, load, fields=None):
+    counter.reset()
+    start = time.perf_counter()
+    services = load(*engines, fields)
+    if asyncio.iscoroutine(services):
+        services = await services
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {len(counter.statements):6d} queries  {elapsed * 1000:9.1f} ms  {len(services)} services")
+    return services, list(counter.statements)
+
+
+async def run(database_url, count):
+    engine = create_engine(database_url)
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    populate(engine, count)
+
+    async_engine = create_async_engine(to_async_url(database_url))
+    counter = QueryCounter()
+    counter.attach(engine)
+    counter.attach(async_engine.sync_engine)
+    engines = (engine, async_engine)
+
+    lazy, _ = await measure(engines, counter, "lazy loading", load_lazy)
+    eager, _ = await measure(engines, counter, "include=forms", load_prepared)
+    fields = parse_fields("title,digital_service")
+    projected, statements = await measure(engines, counter, "include=forms&fields=...", load_prepared, fields)
+    await async_engine.dispose()
+    engine.dispose()
+
+    assert len(eager) == len(lazy) and len(projected) == len(lazy)
+    for expected, service, partial in zip(lazy, eager, projected):
+        assert service["forms"] == expected["forms"] == partial["forms"]
+        assert set(partial) == {"id", "title", "digital_service", "forms"}
+    # Eine Abfrage für die Dienstleistungen, eine für alle Formulare - unabhängig von --count
+    assert len(statements) == 2, statements
+    assert "voraussetzungen" not in statements[0], "projection still selects the text columns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query count benchmark for include=forms and fields=")
+    parser.add_argument("--count", type=int, default=300, help="number of services")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}", args.count))
+
+
+if __name__ == "__main__":
+    main()
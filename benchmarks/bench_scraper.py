@@ -0,0 +1,189 @@
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import FixtureServer, load_archive_pages, load_saved_pages
+from benchmarks.golden import GOLDEN_PAGES, GOLDEN_PATH, compare_golden, load_golden, normalize, save_golden
+
+# End-to-end-Benchmark von crawl_data() gegen den lokalen Fixture-Server, mit Golden-Output-Prüfung:
+#   python -m benchmarks.bench_scraper --count 300 --latency 0.02 --error-rate 0.05
+#   python -m benchmarks.bench_scraper --pages saved_pages/ --golden saved_pages/golden.json --update-golden
+# Gemessen werden ein vollständiger und ein inkrementeller Crawl: Seiten/s, Parse-Zeit pro Seite,
+# geschriebene Zeilen/s und der Spitzenspeicher von Haupt- und Parse-Prozessen.
+
+
+def configure_environment(tmp, args):
+    # config liest die Umgebung beim Import, deshalb vor dem ersten Import aus app setzen
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ["SEARCH_INDEX_PATH"] = os.path.join(tmp, "search_index.json")
+    os.environ["SNAPSHOT_PATH"] = os.path.join(tmp, "catalogue.snapshot")
+    os.environ["SCRAPER_ARCHIVE_DIR"] = ""
+    os.environ["SCRAPER_METRICS_FILE"] = ""
+    os.environ["SCRAPER_PARSE_WORKERS"] = str(args.parse_workers)
+    os.environ.setdefault("SCRAPER_RATE_LIMIT", "0")
+    os.environ.setdefault("SCRAPER_BACKOFF_FACTOR", "0.01")
+
+
+def peak_rss_mb():
+    # ru_maxrss in KiB (Linux); beendete Parse-Prozesse zählen unter RUSAGE_CHILDREN
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, children / 1024
+
+
+def metric_totals():
+    from app.metrics import scraper_commit_duration, scraper_pages, scraper_parse_duration
+
+    return {
+        "pages": sum(scraper_pages.value(outcome=outcome) for outcome in ("written", "unchanged", "failed", "no_title")),
+        "failed": scraper_pages.value(outcome="failed") + scraper_pages.value(outcome="no_title"),
+        "parse_count": scraper_parse_duration.count(),
+        "parse_sum": scraper_parse_duration.sum(),
+        "commit_sum": scraper_commit_duration.sum(),
+    }
+
+
+def count_rows():
+    from sqlmodel import func, select
+
+    from app.db import get_session
+    from app.models import Form, Service, ServiceOfficeLink
+
+    with get_session() as session:
+        return sum(
+            session.exec(select(func.count()).select_from(model)).one()
+            for model in (Service, Form, ServiceOfficeLink)
+        )
+
+
+def measure(label, crawl):
+    before, rows_before = metric_totals(), count_rows()
+    start = time.perf_counter()
+    crawl()
+    elapsed = time.perf_counter() - start
+    after, rows_after = metric_totals(), count_rows()
+
+    delta = {key: after[key] - before[key] for key in after}
+    parse_ms = delta["parse_sum"] / delta["parse_count"] * 1000 if delta["parse_count"] else 0.0
+    rows = rows_after - rows_before
+    rows_per_second = rows / delta["commit_sum"] if delta["commit_sum"] else 0.0
+    print(f"{label:<12} {delta['pages']:6d} pages  {elapsed:7.2f} s  {delta['pages'] / elapsed:8.1f} pages/s  "
+          f"parse {parse_ms:6.2f} ms/page  {rows:7d} new rows  {rows_per_second:9.1f} rows/s (commit)  "
+          f"{delta['failed']} failed")
+
+
+def load_stored(server):
+    # Gespeicherte Dienstleistungen mit Formularen und Behörden, nach Seitennummer
+    from sqlalchemy.orm import selectinload
+    from sqlmodel import select
+
+    from app.db import get_session
+    from app.models import Service
+
+    page_numbers = {url: n for n, url in enumerate(server.service_urls)}
+    records = {}
+    with get_session() as session:
+        services = session.exec(
+            select(Service).options(selectinload(Service.forms), selectinload(Service.offices))
+        ).all()
+        for service in services:
+            data = service.model_dump()
+            data["formulare"] = [{"title": form.title, "url": form.url} for form in sorted(service.forms, key=lambda form: form.id)]
+            data["zustaendige_aemter"] = [office.name for office in service.offices]
+            records[page_numbers[service.source_url]] = normalize(data, server.base_url)
+    return records
+
+
+def failed_jobs():
+    from sqlmodel import func, select
+
+    from app.db import get_session
+    from app.jobs import FAILED
+    from app.models import CrawlJob
+
+    with get_session() as session:
+        return session.exec(select(func.count()).select_from(CrawlJob).where(CrawlJob.status == FAILED)).one()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end scraper benchmark with golden-output checks")
+    parser.add_argument("--count", type=int, default=300, help="number of synthetic service pages")
+    parser.add_argument("--pages", help="directory with saved service pages (*.html)")
+    parser.add_argument("--archive", help="page archive directory written with SCRAPER_ARCHIVE_DIR")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated server latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of page requests answered with 503")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the simulated errors")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1,
+                        help="processes for the separate parse stage (0 = parse in the download threads)")
+    parser.add_argument("--database-url", help="scratch database, all tables are dropped (default: temporary SQLite file)")
+    parser.add_argument("--golden", help=f"expected fields per page (default for synthetic pages: {GOLDEN_PATH})")
+    parser.add_argument("--update-golden", action="store_true", help="write the stored fields as the new golden file")
+    args = parser.parse_args()
+
+    if args.archive:
+        pages = load_archive_pages(args.archive)
+    elif args.pages:
+        pages = load_saved_pages(args.pages)
+    else:
+        pages = None
+    golden_path = args.golden or (None if pages is not None else GOLDEN_PATH)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(tmp, args)
+
+        from sqlmodel import SQLModel
+
+        import app.scraper as scraper
+        from app.db import get_engine, init_db
+
+        SQLModel.metadata.drop_all(get_engine())
+        init_db()
+
+        with FixtureServer(pages=pages, count=args.count, latency=args.latency,
+                           error_rate=args.error_rate, seed=args.seed) as server:
+            scraper.BASE_URL = server.index_url
+            measure("full", lambda: scraper.crawl_data(concurrency=args.concurrency, incremental=False, restart=True))
+            crawl_rss_mb, _ = peak_rss_mb()
+            stored = load_stored(server)
+            failed = failed_jobs()
+            measure("incremental", lambda: scraper.crawl_data(concurrency=args.concurrency, incremental=True, restart=True))
+
+        own_mb, children_mb = peak_rss_mb()
+        print(f"peak RSS: {crawl_rss_mb:.1f} MB after the full crawl, {own_mb:.1f} MB main process overall, "
+              f"{children_mb:.1f} MB largest parse process")
+        print(f"503 responses served: {server.errors_served}")
+
+    exit_code = 0
+    # Jede nicht gespeicherte Seite muss als fehlgeschlagener Job erfasst sein
+    missing = len(server.service_urls) - len(stored)
+    print(f"pages stored: {len(stored)} of {len(server.service_urls)}, failed jobs: {failed}")
+    if missing != failed:
+        print("pages missing without a failed crawl job")
+        exit_code = 1
+
+    if golden_path is None:
+        print("golden check skipped (pass --golden for saved pages)")
+    elif args.update_golden:
+        limit = GOLDEN_PAGES if golden_path == GOLDEN_PATH else len(server.service_urls)
+        if any(n not in stored for n in range(min(limit, len(server.service_urls)))):
+            raise SystemExit("not all golden pages were stored, rerun without --error-rate")
+        save_golden({n: record for n, record in stored.items() if n < limit}, golden_path)
+        print(f"golden file written to {golden_path}")
+    else:
+        golden = load_golden(golden_path)
+        mismatches = compare_golden(stored, golden)
+        compared = sum(1 for key in golden if int(key) in stored)
+        print(f"golden check: {compared} pages compared, {len(mismatches)} field mismatches")
+        for page_number, field in mismatches[:20]:
+            print(f"  page {page_number}: {field}")
+        if mismatches:
+            exit_code = 1
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
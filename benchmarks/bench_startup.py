@@ -0,0 +1,67 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+# Import- und Startzeit der API gegen die Datenbank in DATABASE_URL:
+#   python -m benchmarks.bench_startup --runs 5
+# "import" misst einen frischen Interpreter bis nach dem Import, "first response" die Zeit vom
+# Start eines uvicorn-Workers (inklusive Lifespan und Schema-Prüfung) bis zur ersten Antwort.
+
+
+def time_import(module, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def time_first_response(port, runs, timeout=60):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        server = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+        ])
+        try:
+            while True:
+                if server.poll() is not None:
+                    raise SystemExit("uvicorn exited during startup")
+                if time.perf_counter() - start > timeout:
+                    raise SystemExit("uvicorn did not answer in time")
+                try:
+                    if requests.get(f"http://127.0.0.1:{port}/", timeout=1).ok:
+                        break
+                except requests.exceptions.RequestException:
+                    time.sleep(0.02)
+            timings.append(time.perf_counter() - start)
+        finally:
+            server.terminate()
+            server.wait()
+    return timings
+
+
+def describe(label, timings):
+    print(f"{label:<24} median {statistics.median(timings) * 1000:8.0f} ms  min {min(timings) * 1000:8.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import and startup time of the API")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    describe("python (baseline)", time_import("sys", args.runs))
+    describe("import app.db", time_import("app.db", args.runs))
+    describe("import app.scraper", time_import("app.scraper", args.runs))
+    describe("import main", time_import("main", args.runs))
+    describe("uvicorn first response", time_first_response(args.port, args.runs))
+
+
+if __name__ == "__main__":
+    main()
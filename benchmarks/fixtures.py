@@ -0,0 +1,217 @@
+import hashlib
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Synthetische Dienstleistungsseiten im Aufbau von service.berlin.de
+
+OFFICES = [
+    "Bürgeramt Mitte",
+    "Bürgeramt Pankow",
+    "Bürgeramt Neukölln",
+    "Standesamt Charlottenburg-Wilmersdorf",
+    "Landesamt für Einwanderung",
+    "Finanzamt Friedrichshain-Kreuzberg",
+]
+
+WORDS = (
+    "Antrag Nachweis Personalausweis Meldebescheinigung Wohnsitz Gebühr Vollmacht "
+    "Geburtsurkunde Reisepass Aufenthaltstitel Termin Bescheid Formular Unterschrift "
+    "Bearbeitung Kopie Original Anmeldung Abmeldung Ummeldung Berlin Bezirk"
+).split()
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)) + "."
+
+
+def _list_items(rng, count):
+    return "\n".join(f"<li>{_sentence(rng)}</li>" for _ in range(count))
+
+
+def generate_service_page(service_id, base_url="http://127.0.0.1"):
+    rng = random.Random(service_id)
+    offices = rng.sample(OFFICES, rng.randint(1, 3))
+    office_labels = "\n".join(
+        f'<div class="form-check"><label class="form-check-label"><strong>{office}</strong> '
+        f'<span>{_sentence(rng, 4)}</span></label></div>'
+        for office in offices
+    )
+    forms = "\n".join(
+        f'<li><a href="{base_url}/formulare/{service_id}-{n}.pdf">Formular {service_id}-{n}</a></li>'
+        for n in range(rng.randint(0, 4))
+    )
+    online_link = ""
+    if rng.random() < 0.3:
+        online_link = '<a class="list-item-style" title="Jetzt online erledigen" href="#online">Jetzt online erledigen</a>'
+
+    return f"""<!DOCTYPE html>
+<html lang="de">
+<head>
+<meta charset="utf-8">
+<title>Dienstleistung {service_id} - Service Berlin</title>
+<style>{"body {{ margin: 0; }} " * 200}</style>
+<script>{"var tracking = {{}}; " * 300}</script>
+</head>
+<body>
+<nav>{"".join(f'<a href="{base_url}/nav/{n}/">Navigation {n}</a>' for n in range(40))}</nav>
+<div id="layout-grid__area--maincontent">
+<h1>Dienstleistung {service_id}: {_sentence(rng, 3)}</h1>
+{online_link}
+<h2>Voraussetzungen</h2>
+<ul>{_list_items(rng, rng.randint(1, 6))}</ul>
+<p>{_sentence(rng, 30)}</p>
+<h2>Erforderliche Unterlagen</h2>
+<ul>{_list_items(rng, rng.randint(1, 8))}</ul>
+<h2>Gebühren</h2>
+<p>{rng.randint(0, 120)},00 Euro</p>
+<h2>Rechtsgrundlagen</h2>
+<ul>{_list_items(rng, rng.randint(1, 4))}</ul>
+<h2>Formulare</h2>
+<ul>{forms}</ul>
+<h2>Zuständige Behörden</h2>
+{office_labels}
+</div>
+<footer>{_sentence(rng, 50)}</footer>
+</body>
+</html>"""
+
+
+def generate_form_document(name):
+    # Formular-PDF mit fester, vom Namen abhängiger Größe; etwa jeder zehnte Link ist tot (None)
+    digest = hashlib.md5(name.encode("utf-8")).digest()
+    if digest[0] < 26:
+        return None
+    return b"%PDF-1.4\n" + b"0" * (1000 + int.from_bytes(digest[1:3], "big"))
+
+
+def generate_index_page(service_urls):
+    links = "\n".join(
+        f'<div class="row"><div class="span7"><a href="{url}">Dienstleistung {n}</a></div></div>'
+        for n, url in enumerate(service_urls)
+    )
+    return f"<!DOCTYPE html><html><head><title>Dienstleistungen</title></head><body>{links}</body></html>"
+
+
+def load_saved_pages(directory):
+    # Gespeicherte Seiten (*.html) aus einem Verzeichnis, sortiert nach Dateiname
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".html"):
+            with open(os.path.join(directory, name), "rb") as f:
+                pages.append(f.read())
+    return pages
+
+
+def load_archive_pages(path):
+    # Jüngster Stand jeder archivierten Dienstleistungsseite (siehe app.archive)
+    from app.archive import PageArchive
+    from app.parser import decode_content
+
+    pages = []
+    with PageArchive(path) as archive:
+        for url in sorted(archive.urls()):
+            if "/dienstleistung/" in url:
+                entry = archive.latest(url)
+                pages.append(decode_content(archive.read(entry), entry["encoding"]))
+    return pages
+
+
+class FixtureServer:
+    # Lokaler HTTP-Server, der einen Nachbau von service.berlin.de/dienstleistungen/ ausliefert
+    # error_rate: Anteil der Anfragen an Dienstleistungsseiten, die mit 503 beantwortet werden
+    def __init__(self, pages=None, count=200, latency=0.0, error_rate=0.0, seed=0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.errors_served = 0
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}"
+        # Ohne gespeicherte Seiten werden die synthetischen Seiten bei jeder Anfrage erzeugt, damit der
+        # Server selbst nicht mit der Seitenzahl wächst (Speichermessungen im selben Prozess)
+        self.pages = pages
+        self.count = len(pages) if pages is not None else count
+        self.service_urls = [f"{self.base_url}/dienstleistung/{n}/" for n in range(self.count)]
+        self.index_url = f"{self.base_url}/dienstleistungen/"
+        self.index_page = generate_index_page(self.service_urls).encode("utf-8")
+        self._thread = None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self.respond(send_body=True)
+
+            def do_HEAD(self):
+                self.respond(send_body=False)
+
+            def respond(self, send_body):
+                if server.latency:
+                    time.sleep(server.latency)
+                body = server.lookup(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                if self.path.startswith("/dienstleistung/") and server.fail_request():
+                    self.send_error(503)
+                    return
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                if self.path.endswith(".pdf"):
+                    self.send_header("Content-Type", "application/pdf")
+                else:
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def fail_request(self):
+        if not self.error_rate:
+            return False
+        with self._random_lock:
+            failed = self._random.random() < self.error_rate
+            self.errors_served += failed
+        return failed
+
+    def lookup(self, path):
+        if path == "/dienstleistungen/":
+            return self.index_page
+        parts = path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "dienstleistung" and parts[1].isdigit():
+            index = int(parts[1])
+            if index < self.count:
+                if self.pages is None:
+                    return generate_service_page(index, self.base_url).encode("utf-8")
+                return self.pages[index]
+        if len(parts) == 2 and parts[0] == "formulare":
+            return generate_form_document(parts[1])
+        return None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
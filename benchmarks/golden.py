@@ -0,0 +1,57 @@
+import json
+import os
+
+# Erwartete Felder der ersten synthetischen Seiten aus benchmarks/fixtures.py. Optimierungen an Parser
+# und Persistenz dürfen sie nicht verändern; gewollte Änderungen mit --update-golden übernehmen und
+# den Diff der JSON-Datei im Review prüfen.
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "golden", "services.json")
+GOLDEN_PAGES = 50
+BASE_URL_PLACEHOLDER = "{base_url}"
+
+FIELDS = (
+    "title",
+    "voraussetzungen",
+    "erforderliche_unterlagen",
+    "gebuehren",
+    "rechtsgrundlagen",
+    "digital_service",
+    "zustaendiges_amt",
+)
+
+
+def normalize(service_data, base_url):
+    # Vergleichbare Form: Adresse des Fixture-Servers als Platzhalter, Behörden sortiert
+    # (die Datenbank speichert ihre Reihenfolge nicht)
+    record = {field: service_data[field] for field in FIELDS}
+    record["formulare"] = [
+        {"title": form["title"], "url": form["url"].replace(base_url, BASE_URL_PLACEHOLDER)}
+        for form in service_data["formulare"]
+    ]
+    record["zustaendige_aemter"] = sorted(service_data["zustaendige_aemter"])
+    return record
+
+
+def load_golden(path=GOLDEN_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_golden(records, path=GOLDEN_PATH):
+    # records: {Seitennummer: normalisierte Felder}
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        json.dump({str(n): records[n] for n in sorted(records)}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+def compare_golden(records, golden):
+    # Liefert (Seitennummer, Feld) für jede Abweichung; Seiten ohne Eintrag in records werden übersprungen
+    mismatches = []
+    for key, expected in golden.items():
+        actual = records.get(int(key))
+        if actual is None:
+            continue
+        for field in expected:
+            if actual.get(field) != expected[field]:
+                mismatches.append((int(key), field))
+    return mismatches
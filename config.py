@@ -10,6 +10,71 @@ class Config:
     DEBUG = os.getenv("DEBUG", "False").lower() in ["true", "1", "t"]
     ENV = os.getenv("ENV", "development")
 
+    # Asynchroner Treiber für die API (leer = aus DATABASE_URL abgeleitet, z. B. mysql+aiomysql)
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+    # Connection-Pool: Größe, zusätzliche Verbindungen, Prüfung vor Verwendung, Erneuerung nach Sekunden
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() in ["true", "1", "t"]
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+
+    # Scraper: Parallelität, Rate-Limit (Anfragen pro Sekunde und Host) und Wiederholungen
+    SCRAPER_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", "8"))
+    SCRAPER_RATE_LIMIT = float(os.getenv("SCRAPER_RATE_LIMIT", "10"))
+    SCRAPER_MAX_RETRIES = int(os.getenv("SCRAPER_MAX_RETRIES", "3"))
+    SCRAPER_BACKOFF_FACTOR = float(os.getenv("SCRAPER_BACKOFF_FACTOR", "0.5"))
+    SCRAPER_TIMEOUT = float(os.getenv("SCRAPER_TIMEOUT", "10"))
+    # Inkrementeller Crawl mit If-None-Match/If-Modified-Since
+    SCRAPER_INCREMENTAL = os.getenv("SCRAPER_INCREMENTAL", "True").lower() in ["true", "1", "t"]
+    # Anzahl der Dienstleistungen pro Datenbank-Transaktion
+    SCRAPER_BATCH_SIZE = int(os.getenv("SCRAPER_BATCH_SIZE", "100"))
+    # HTML-Parser für BeautifulSoup: "html.parser" oder "lxml" (optional, schneller)
+    SCRAPER_HTML_PARSER = os.getenv("SCRAPER_HTML_PARSER", "html.parser")
+    # Bereich der Dienstleistungsseite, der geparst wird ("body", "div#id", "div.klasse"; leer = ganze Seite);
+    # ohne Überschrift h1 in diesem Bereich wird die ganze Seite geparst
+    SCRAPER_CONTENT_REGION = os.getenv("SCRAPER_CONTENT_REGION", "div#layout-grid__area--maincontent")
+    # Parse-Prozesse (0 = in den Download-Threads parsen) und maximale Anzahl Seiten zwischen den Stufen
+    SCRAPER_PARSE_WORKERS = int(os.getenv("SCRAPER_PARSE_WORKERS", str(os.cpu_count() or 1)))
+    SCRAPER_QUEUE_SIZE = int(os.getenv("SCRAPER_QUEUE_SIZE", "64"))
+    # Verzeichnis für das lokale Seitenarchiv (leer = kein Archiv)
+    SCRAPER_ARCHIVE_DIR = os.getenv("SCRAPER_ARCHIVE_DIR", "")
+    # Metriken des Crawls im Prometheus-Textformat (leer = nicht schreiben), z. B. für den node_exporter
+    SCRAPER_METRICS_FILE = os.getenv("SCRAPER_METRICS_FILE", "")
+    # Fehlversuche je URL, nach denen ein fortgesetzter Crawl sie nicht mehr automatisch wiederholt
+    SCRAPER_MAX_ATTEMPTS = int(os.getenv("SCRAPER_MAX_ATTEMPTS", "3"))
+    # Formular-Links nach jedem Crawl per HEAD prüfen: parallele Anfragen, Anfragen pro Sekunde und Host,
+    # Alter (Sekunden), ab dem ein bereits geprüfter Link erneut geprüft wird
+    SCRAPER_CHECK_LINKS = os.getenv("SCRAPER_CHECK_LINKS", "False").lower() in ["true", "1", "t"]
+    LINK_CHECK_CONCURRENCY = int(os.getenv("LINK_CHECK_CONCURRENCY", "16"))
+    LINK_CHECK_RATE_LIMIT = float(os.getenv("LINK_CHECK_RATE_LIMIT", "5"))
+    LINK_CHECK_MAX_AGE = float(os.getenv("LINK_CHECK_MAX_AGE", str(7 * 24 * 3600)))
+
+    # Antwort-Cache der API: Anzahl Einträge, Lebensdauer und Prüfintervall der Katalogversion (Sekunden)
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+    CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+    CACHE_VERSION_CHECK_INTERVAL = float(os.getenv("CACHE_VERSION_CHECK_INTERVAL", "5"))
+    # Antworten ab dieser Größe (Bytes) werden je nach Accept-Encoding mit gzip bzw. brotli komprimiert
+    # (brotli nur, wenn das Paket installiert ist; sonst nur gzip)
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+    # Datei des Suchindex, wird am Ende jedes Crawls geschrieben
+    SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "search_index.json")
+    # Katalog-Snapshot, ebenfalls am Ende jedes Crawls geschrieben; API_MODE=snapshot liest nur daraus
+    SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "catalogue.snapshot")
+    API_MODE = os.getenv("API_MODE", "database")
+
+    # Metriken unter /metrics; Profiling eines Anteils der Anfragen, geloggt ab der Schwelle (Sekunden)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() in ["true", "1", "t"]
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_SLOW_REQUEST_SECONDS = float(os.getenv("PROFILE_SLOW_REQUEST_SECONDS", "1.0"))
+
+    # Authentifizierung: Cache für angemeldete Benutzer (Einträge, Sekunden) und Threads für bcrypt
+    AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "1024"))
+    AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+    # Spätestens nach so vielen Sekunden wird is_active eines zwischengespeicherten Benutzers neu gelesen
+    AUTH_ACTIVE_CHECK_INTERVAL = float(os.getenv("AUTH_ACTIVE_CHECK_INTERVAL", "5"))
+    AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+
 class DevelopmentConfig(Config):
     pass
 
@@ -1,14 +1,50 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from sqlmodel import SQLModel
-from app.db import engine
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import DBAPIError
+from app.db import dispose_engines, get_engine
+from app.metrics import MetricsMiddleware
+from app.migrations import run_migrations
 from app.routes import router
+from app.snapshot_routes import router as snapshot_router, snapshot_store
+from config import config
+import logging
+import os
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
-@app.on_event("startup")
-def on_startup():
-    SQLModel.metadata.create_all(engine)
+settings = config[os.getenv("ENV", "development")]
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.API_MODE == "snapshot":
+        # Lesezugriffe nur aus dem Snapshot; ihn vorab laden, damit schon die erste Anfrage schnell ist
+        try:
+            await run_in_threadpool(snapshot_store.get)
+        except FileNotFoundError:
+            logger.error(f"Catalogue snapshot {settings.SNAPSHOT_PATH} not found, run the scraper first")
+    else:
+        # Schema prüfen und bei Bedarf migrieren; ist es aktuell, kostet das eine einzige Abfrage
+        try:
+            await run_in_threadpool(run_migrations, get_engine())
+        except DBAPIError as e:
+            # Datenbank kurz nicht erreichbar: Worker trotzdem starten, Verbindungen entstehen bei Bedarf
+            logger.error(f"Schema check failed, database not reachable: {e}")
+    yield
+    await dispose_engines()
+
+app = FastAPI(lifespan=lifespan)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(
+        MetricsMiddleware,
+        profile_sample_rate=settings.PROFILE_SAMPLE_RATE,
+        profile_threshold=settings.PROFILE_SLOW_REQUEST_SECONDS,
+    )
+
+if settings.API_MODE == "snapshot":
+    # Muss vor dem Datenbank-Router stehen: bei gleichen Pfaden gewinnt die zuerst registrierte Route
+    app.include_router(snapshot_router)
 app.include_router(router)
 
 @app.get("/")